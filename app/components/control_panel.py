@@ -8,8 +8,7 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-import pandas as pd
-from ..utils.validators import validate_excel_file
+from ..utils.validators import validate_excel_file, get_sheet_headers
 from ..utils.ui_helpers import create_custom_button, create_card_frame, create_icon_button, MODERN_COLORS
 
 
@@ -436,9 +435,9 @@ class ControlPanel:
         try:
             self.gui_app._log_output(f"📊 正在读取Excel文件: {os.path.basename(excel_path)}")
             
-            # 读取Excel文件的sheet名称
-            excel_file = pd.ExcelFile(excel_path)
-            self.gui_app.available_sheets = excel_file.sheet_names
+            # 读取Excel文件的sheet名称及表头（只读表头行，结果会被后续验证复用）
+            sheet_headers = get_sheet_headers(excel_path)
+            self.gui_app.available_sheets = list(sheet_headers)
             
             # 清除现有的sheet复选框
             for widget in self.gui_app.sheets_container.winfo_children():
@@ -454,14 +453,13 @@ class ControlPanel:
             
             # 读取第一个sheet的列名
             if self.gui_app.available_sheets:
-                first_sheet = excel_file.parse(self.gui_app.available_sheets[0], nrows=0)
-                columns = list(first_sheet.columns)
+                columns = list(sheet_headers[self.gui_app.available_sheets[0]])
                 
                 # 更新列名下拉框
                 self.gui_app.column_combo['values'] = columns
                 
                 # 自动选择包含"query"的列
-                query_columns = [col for col in columns if 'query' in col.lower()]
+                query_columns = [col for col in columns if 'query' in str(col).lower()]
                 if query_columns:
                     self.gui_app.column_var.set(query_columns[0])
                 elif columns:
@@ -421,6 +421,10 @@ class PhoneAutomationMainWindow:
         except Exception as e:
             self._log_output(f"⚠️ 退出时保存配置失败: {e}")
         
+        # 停止后台任务
+        if hasattr(self, 'task_manager'):
+            self.task_manager.shutdown()
+        
         # 关闭窗口
         self.root.destroy()
     
@@ -92,7 +92,7 @@ class ConfigManager:
             config.device_id = self.gui_app.device_id_var.get()
             
             # 更新系统config的应用包名映射
-            config.app_packages.update(self.gui_app.app_packages)
+            config.update_app_packages(self.gui_app.app_packages)
             
             # 保存到文件
             if gui_config.save_config():
@@ -6,6 +6,8 @@
 """
 
 import os
+import re
+import subprocess
 import sys
 import threading
 
@@ -15,6 +17,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 from src.device_controller import DeviceController
 from src.logger_config import get_logger
 
+# 解析 `adb shell wm size` 输出，例如: "Physical size: 1080x2340"
+_WM_SIZE_RE = re.compile(r'Physical size:\s*(\d+)x(\d+)')
+
 
 class DeviceManager:
     """设备管理器"""
@@ -105,10 +110,6 @@ class DeviceManager:
         # 如果控制面板中也有设备信息标签，也更新它
         if hasattr(self.gui_app, 'device_info_label') and self.gui_app.device_info_label:
             self.gui_app.device_info_label.config(text=text, foreground=color)
-            
-        # 强制更新UI显示
-        if hasattr(self.gui_app, 'root') and self.gui_app.root:
-            self.gui_app.root.update_idletasks()
     
     def check_device(self):
         """检查设备连接状态"""
@@ -138,7 +139,7 @@ class DeviceManager:
                 return "connected"
             else:
                 return "disconnected"
-        except:
+        except Exception:
             return "error"
     
     def get_device_info_dict(self):
@@ -151,7 +152,7 @@ class DeviceManager:
             if not self.device_controller:
                 self.device_controller = DeviceController()
             return self.device_controller.test_connection()
-        except:
+        except Exception:
             return False
     
     def get_device_id(self):
@@ -174,7 +175,7 @@ class DeviceManager:
             version_num = float(version.split('.')[0])
             if version_num < 7:  # 要求Android 7.0以上
                 return False, f"Android版本过低: {version}，需要7.0以上"
-        except:
+        except (AttributeError, ValueError):
             self.gui_app._log_output("⚠️ 无法解析Android版本")
         
         # 检查屏幕状态（这需要额外的ADB命令）
@@ -182,7 +183,7 @@ class DeviceManager:
             if self.device_controller:
                 # 这里可以添加更多的设备检查逻辑
                 pass
-        except:
+        except Exception:
             pass
         
         return True, "设备满足运行要求"
@@ -194,7 +195,6 @@ class DeviceManager:
                 self.device_controller = DeviceController()
             
             # 发送唤醒命令
-            import subprocess
             result = subprocess.run(
                 ['adb', 'shell', 'input', 'keyevent', 'KEYCODE_WAKEUP'],
                 capture_output=True, text=True
@@ -218,7 +218,6 @@ class DeviceManager:
                 self.device_controller = DeviceController()
             
             # 获取屏幕分辨率
-            import subprocess
             result = subprocess.run(
                 ['adb', 'shell', 'wm', 'size'],
                 capture_output=True, text=True
@@ -226,13 +225,10 @@ class DeviceManager:
             
             screen_info = {}
             if result.returncode == 0:
-                # 解析输出，例如: "Physical size: 1080x2340"
-                output = result.stdout.strip()
-                if 'Physical size:' in output:
-                    size_str = output.split('Physical size:')[1].strip()
-                    width, height = size_str.split('x')
-                    screen_info['width'] = int(width)
-                    screen_info['height'] = int(height)
+                match = _WM_SIZE_RE.search(result.stdout)
+                if match:
+                    screen_info['width'] = int(match.group(1))
+                    screen_info['height'] = int(match.group(2))
             
             return screen_info
             
@@ -251,7 +247,6 @@ class DeviceManager:
             
             for app_name, package_name in app_packages.items():
                 # 检查应用是否已安装
-                import subprocess
                 result = subprocess.run(
                     ['adb', 'shell', 'pm', 'list', 'packages', package_name],
                     capture_output=True, text=True
@@ -6,11 +6,14 @@
 """
 
 import os
+import shutil
 import sys
 import threading
+import time
+import tkinter as tk
 import pandas as pd
-import json
 from datetime import datetime
+from concurrent.futures import Future
 
 # 添加src模块路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
@@ -18,6 +21,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 from src.task_executor import TaskExecutor
 from src.config import config
 from src.logger_config import get_logger
+from src.json_utils import dump_json
 from ..utils.validators import (
     validate_task_description, validate_batch_execution_params
 )
@@ -29,7 +33,9 @@ class TaskManager:
     
     def __init__(self, gui_app):
         self.gui_app = gui_app
-        self.current_task = None
+        # 任务在守护线程中运行（关闭窗口时不阻塞进程退出），Future用于跟踪任务状态
+        self._future = None
+        self._closing = False
         self.task_executor = None
         self.cancel_requested = False
         self.logger = get_logger("task_manager")
@@ -42,7 +48,7 @@ class TaskManager:
             self.logger.error(f"❌ 任务验证失败: {msg}")
             return False
         
-        if self.current_task and self.current_task.is_alive():
+        if self.is_task_running():
             self.logger.warning("⚠️ 当前有任务正在执行")
             return False
         
@@ -54,15 +60,31 @@ class TaskManager:
         self.gui_app.root.after(0, lambda: self.gui_app._update_status("🚀 执行中...", "orange"))
         self.gui_app.root.after(0, lambda: self._update_control_buttons(True))  # 显示中断按钮
         
-        # 在新线程中执行任务
-        self.current_task = threading.Thread(
-            target=self._run_single_task,
-            args=(task_query,),
-            daemon=True
-        )
-        self.current_task.start()
+        # 在后台线程中执行任务
+        self._submit(self._run_single_task, task_query)
         return True
     
+    def _submit(self, fn, *args):
+        """在后台守护线程中执行任务，任务结束后重置UI"""
+        future = Future()
+        self._future = future
+        
+        def run():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            
+            # 重新启用按钮，隐藏中断按钮（窗口正在关闭或已销毁时不再更新UI）
+            if self._closing:
+                return
+            try:
+                self.gui_app.root.after(0, self._reset_ui_after_task)
+            except (tk.TclError, RuntimeError):
+                pass
+        
+        threading.Thread(target=run, daemon=True).start()
+    
     def _run_single_task(self, query):
         """在新线程中运行单个任务"""
         try:
@@ -96,7 +118,7 @@ class TaskManager:
             self.task_executor = TaskExecutor(output_base_dir=output_dir)
             
             # 更新任务执行器的应用包名映射
-            config.app_packages.update(self.gui_app.app_packages)
+            config.update_app_packages(self.gui_app.app_packages)
             
             # 执行任务（需要在执行过程中检查中断）
             success = self._execute_with_cancel_check(query)
@@ -117,9 +139,6 @@ class TaskManager:
         except Exception as e:
             self.logger.error(f"❌ 任务执行异常: {e}")
             self.gui_app._update_status("❌ 异常", "red")
-        finally:
-            # 重新启用按钮，隐藏中断按钮
-            self.gui_app.root.after(0, lambda: self._reset_ui_after_task())
     
     def _execute_with_cancel_check(self, query):
         """执行任务并检查取消请求"""
@@ -144,6 +163,8 @@ class TaskManager:
         """任务完成后重置UI状态"""
         self.gui_app._set_buttons_state(True)
         self._update_control_buttons(False)  # 隐藏中断按钮
+        if self.task_executor:
+            self.task_executor.close()
         self.task_executor = None
     
     def _update_control_buttons(self, task_running):
@@ -159,7 +180,7 @@ class TaskManager:
             self.logger.error(f"❌ 批量任务验证失败: {msg}")
             return False
         
-        if self.current_task and self.current_task.is_alive():
+        if self.is_task_running():
             self.logger.warning("⚠️ 当前有任务正在执行")
             return False
         
@@ -171,13 +192,8 @@ class TaskManager:
         self.gui_app.root.after(0, lambda: self.gui_app._update_status("📊 批量执行中...", "orange"))
         self.gui_app.root.after(0, lambda: self._update_control_buttons(True))  # 显示中断按钮
         
-        # 在新线程中执行批量任务
-        self.current_task = threading.Thread(
-            target=self._run_batch_tasks,
-            args=(excel_path, selected_sheets, target_column),
-            daemon=True
-        )
-        self.current_task.start()
+        # 在后台线程中执行批量任务
+        self._submit(self._run_batch_tasks, excel_path, selected_sheets, target_column)
         return True
     
     def _run_batch_tasks(self, excel_path, selected_sheets, target_column):
@@ -207,9 +223,6 @@ class TaskManager:
         except Exception as e:
             self.logger.error(f"❌ 批量任务执行异常: {e}")
             self.gui_app._update_status("❌ 批量异常", "red")
-        finally:
-            # 重新启用按钮，隐藏中断按钮
-            self.gui_app.root.after(0, lambda: self._reset_ui_after_task())
     
     def _execute_custom_batch(self, excel_path, selected_sheets, target_column):
         """执行自定义批量任务"""
@@ -236,15 +249,12 @@ class TaskManager:
             os.makedirs(batch_output_base, exist_ok=True)
             
             # 更新任务执行器的应用包名映射
-            config.app_packages.update(self.gui_app.app_packages)
+            config.update_app_packages(self.gui_app.app_packages)
             
             total_tasks = 0
             success_tasks = 0
             failed_tasks = []
             
-            # 读取Excel文件
-            excel_file = pd.ExcelFile(excel_path)
-            
             for sheet_name in selected_sheets:
                 # 检查是否被取消
                 if self.cancel_requested:
@@ -253,18 +263,15 @@ class TaskManager:
                 
                 self.logger.info(f"\n📋 处理Sheet: {sheet_name}")
                 
-                # 读取sheet数据
-                df = pd.read_excel(excel_file, sheet_name=sheet_name)
+                # 读取sheet数据，提取任务列表后立即释放文件句柄，执行期间不持有工作簿
+                with pd.ExcelFile(excel_path) as excel_file:
+                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
                 
                 # 检查目标列是否存在
                 if target_column not in df.columns:
                     self.logger.warning(f"⚠️ Sheet '{sheet_name}' 中未找到列 '{target_column}'，跳过")
                     continue
                 
-                # 创建sheet输出目录 - 直接在batch_output_base下
-                sheet_output_dir = os.path.join(batch_output_base, sheet_name)
-                os.makedirs(sheet_output_dir, exist_ok=True)
-                
                 # 提取任务列表
                 queries = []
                 for index, row in df.iterrows():
@@ -275,6 +282,11 @@ class TaskManager:
                             'row': index + 2,  # Excel行号（从1开始，加上表头）
                             'sheet': sheet_name
                         })
+                del df
+                
+                # 创建sheet输出目录 - 直接在batch_output_base下
+                sheet_output_dir = os.path.join(batch_output_base, sheet_name)
+                os.makedirs(sheet_output_dir, exist_ok=True)
                 
                 self.logger.info(f"📝 从Sheet '{sheet_name}' 的列 '{target_column}' 中提取到 {len(queries)} 个任务")
                 
@@ -283,13 +295,13 @@ class TaskManager:
                 for i, query_info in enumerate(queries, 1):
                     # 检查是否被取消
                     if self.cancel_requested:
-                        self.logger.warning(f"🛑 批量任务在第 {i}/{len(queries)} 个任务时被中断")
+                        self.logger.warning("🛑 批量任务在第 {}/{} 个任务时被中断", i, len(queries))
                         return False
                     
                     query = query_info['query']
                     row_num = query_info['row']
                     
-                    self.logger.info(f"🔄 执行任务 {i}/{len(queries)}: {query}")
+                    self.logger.info("🔄 执行任务 {}/{}: {}", i, len(queries), query)
                     
                     try:
                         # 为每个任务创建独立的执行器，直接输出到目标路径
@@ -309,15 +321,18 @@ class TaskManager:
                         # 保存executor引用用于中断
                         self.task_executor = executor
                         
-                        # 执行单个任务
-                        start_time = datetime.now()
-                        success = executor.run_task(query)
-                        end_time = datetime.now()
-                        execution_time = (end_time - start_time).total_seconds()
+                        # 执行单个任务（每个任务的执行器用完即释放其后台线程）
+                        t0 = time.perf_counter()
+                        started_iso = datetime.now().isoformat()
+                        try:
+                            success = executor.run_task(query)
+                        finally:
+                            executor.close()
+                        execution_time = time.perf_counter() - t0
                         
                         # 再次检查是否被取消（任务执行后）
                         if self.cancel_requested:
-                            self.logger.warning(f"🛑 批量任务在任务 {i}/{len(queries)} 执行完成后被中断")
+                            self.logger.warning("🛑 批量任务在任务 {}/{} 执行完成后被中断", i, len(queries))
                             return False
                         
                         # 重命名输出目录为正确的名称（如果需要）
@@ -325,13 +340,11 @@ class TaskManager:
                             actual_output = executor.output_dir
                             if actual_output != task_output_path:
                                 if os.path.exists(task_output_path):
-                                    import shutil
                                     shutil.rmtree(task_output_path)
                                 
-                                import shutil
                                 shutil.move(actual_output, task_output_path)
                             
-                            self.logger.info(f"📁 任务结果已保存到: {task_output_path}")
+                            self.logger.info("📁 任务结果已保存到: {}", task_output_path)
                         
                         # 记录结果
                         result = {
@@ -341,27 +354,26 @@ class TaskManager:
                             'success': success,
                             'execution_time': execution_time,
                             'output_path': task_output_path if success else None,
-                            'timestamp': start_time.isoformat()
+                            'timestamp': started_iso
                         }
                         sheet_results.append(result)
                         
                         total_tasks += 1
                         if success:
                             success_tasks += 1
-                            self.logger.success(f"✅ 任务完成，用时 {execution_time:.1f} 秒")
+                            self.logger.success("✅ 任务完成，用时 {:.1f} 秒", execution_time)
                         else:
                             failed_tasks.append(query_info)
-                            self.logger.error(f"❌ 任务失败，用时 {execution_time:.1f} 秒")
+                            self.logger.error("❌ 任务失败，用时 {:.1f} 秒", execution_time)
                             
                     except Exception as e:
-                        self.logger.error(f"❌ 执行任务时出错: {e}")
+                        self.logger.error("❌ 执行任务时出错: {}", e)
                         failed_tasks.append(query_info)
                         total_tasks += 1
                 
                 # 保存sheet执行结果
                 results_file = os.path.join(sheet_output_dir, f"{sheet_name}_results.json")
-                with open(results_file, 'w', encoding='utf-8') as f:
-                    json.dump(sheet_results, f, indent=2, ensure_ascii=False)
+                dump_json(sheet_results, results_file)
                 
                 self.logger.info(f"📄 Sheet '{sheet_name}' 执行结果已保存: {results_file}")
             
@@ -393,8 +405,7 @@ class TaskManager:
             }
             
             report_file = os.path.join(output_dir, 'batch_execution_report.json')
-            with open(report_file, 'w', encoding='utf-8') as f:
-                json.dump(report, f, indent=2, ensure_ascii=False)
+            dump_json(report, report_file)
             
             # 输出报告摘要
             self.logger.info("\n📊 批量执行报告:")
@@ -410,11 +421,11 @@ class TaskManager:
     
     def is_task_running(self):
         """检查是否有任务正在运行"""
-        return self.current_task and self.current_task.is_alive()
+        return self._future is not None and not self._future.done()
     
     def cancel_current_task(self):
         """取消当前任务"""
-        if self.current_task and self.current_task.is_alive():
+        if self.is_task_running():
             self.logger.warning("🛑 正在取消当前任务...")
             self.cancel_requested = True
             
@@ -434,9 +445,15 @@ class TaskManager:
     
     def get_task_status(self):
         """获取任务状态"""
-        if not self.current_task:
+        if self._future is None:
             return "idle"
-        elif self.current_task.is_alive():
+        elif not self._future.done():
             return "running"
         else:
-            return "completed" 
\ No newline at end of file
+            return "completed"
+    
+    def shutdown(self):
+        """退出时取消正在运行的任务（任务线程为守护线程，不会阻止程序退出）"""
+        self._closing = True
+        if self.is_task_running():
+            self.cancel_current_task()
\ No newline at end of file
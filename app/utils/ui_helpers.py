@@ -8,12 +8,16 @@ UI辅助函数 - 现代化版本
 import tkinter as tk
 from tkinter import ttk
 import os
+import subprocess
+import sys
+import time
 import webbrowser
-from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
 
 
 # 现代化颜色方案
-MODERN_COLORS = {
+MODERN_COLORS = MappingProxyType({
     # 主色调
     'primary': '#667eea',           # 现代蓝色
     'primary_dark': '#5a67d8',      # 深蓝色
@@ -42,65 +46,215 @@ MODERN_COLORS = {
     'connected': '#48bb78',         # 连接成功
     'disconnected': '#f56565',      # 断开连接
     'warning_status': '#ed8936',    # 警告状态
+})
+
+# 图标按钮配色（按样式类型）
+_ICON_BUTTON_STYLES = {
+    'primary': {
+        'bg': MODERN_COLORS['primary'],
+        'fg': MODERN_COLORS['white'],
+        'activebackground': MODERN_COLORS['primary_dark'],
+        'activeforeground': MODERN_COLORS['white'],
+    },
+    'success': {
+        'bg': MODERN_COLORS['success'],
+        'fg': MODERN_COLORS['white'],
+        'activebackground': '#38a169',
+        'activeforeground': MODERN_COLORS['white'],
+    },
+    'warning': {
+        'bg': MODERN_COLORS['warning'],
+        'fg': MODERN_COLORS['white'],
+        'activebackground': '#dd7a1f',
+        'activeforeground': MODERN_COLORS['white'],
+    },
+    'danger': {
+        'bg': MODERN_COLORS['danger'],
+        'fg': MODERN_COLORS['white'],
+        'activebackground': '#e53e3e',
+        'activeforeground': MODERN_COLORS['white'],
+    },
+    'secondary': {
+        'bg': MODERN_COLORS['white'],
+        'fg': MODERN_COLORS['dark'],
+        'activebackground': MODERN_COLORS['light_gray'],
+        'activeforeground': MODERN_COLORS['dark'],
+    }
+}
+
+# 图标按钮基础样式
+_ICON_BUTTON_BASE_STYLE = {
+    'font': ('Arial', 10, 'bold'),
+    'relief': 'flat',
+    'bd': 0,
+    'padx': 15,
+    'pady': 10,
+    'cursor': 'hand2',
 }
 
+# 自定义按钮样式（按样式类型）
+_CUSTOM_BUTTON_STYLES = {
+    'action': {
+        'bg': '#1565C0',
+        'fg': '#FFFFFF',
+        'activebackground': '#0D47A1',
+        'activeforeground': '#FFFFFF',
+        'font': ('Arial', 10, 'bold'),
+        'relief': 'raised',
+        'bd': 2,
+        'padx': 15,
+        'pady': 8,
+        'cursor': 'hand2'
+    },
+    'warning': {
+        'bg': '#FF9800',
+        'fg': '#FFFFFF',
+        'activebackground': '#E68900',
+        'activeforeground': '#FFFFFF',
+        'font': ('Arial', 9, 'bold'),
+        'relief': 'raised',
+        'bd': 2,
+        'padx': 10,
+        'pady': 6,
+        'cursor': 'hand2'
+    },
+    'success': {
+        'bg': '#4CAF50',
+        'fg': '#FFFFFF',
+        'activebackground': '#45A049',
+        'activeforeground': '#FFFFFF',
+        'font': ('Arial', 9, 'bold'),
+        'relief': 'raised',
+        'bd': 2,
+        'padx': 10,
+        'pady': 6,
+        'cursor': 'hand2'
+    },
+    'danger': {
+        'bg': '#F44336',
+        'fg': '#FFFFFF',
+        'activebackground': '#D32F2F',
+        'activeforeground': '#FFFFFF',
+        'font': ('Arial', 9, 'bold'),
+        'relief': 'raised',
+        'bd': 2,
+        'padx': 10,
+        'pady': 6,
+        'cursor': 'hand2'
+    },
+    'config': {
+        'bg': '#FFFFFF',
+        'fg': '#333333',
+        'activebackground': '#FFFFFF',
+        'activeforeground': '#333333',
+        'font': ('Arial', 9),
+        'relief': 'raised',
+        'bd': 1,
+        'padx': 8,
+        'pady': 4,
+        'cursor': 'hand2'
+    },
+    'default': {
+        'bg': '#FFFFFF',
+        'fg': '#333333',
+        'activebackground': '#FFFFFF',
+        'activeforeground': '#333333',
+        'font': ('Arial', 9),
+        'relief': 'raised',
+        'bd': 1,
+        'padx': 8,
+        'pady': 6,
+        'cursor': 'hand2'
+    }
+}
+
+# 文件名非法字符替换表
+_ILLEGAL_FILENAME_TABLE = str.maketrans({c: '_' for c in '/\\:*?"<>|'})
+
+# 现代化ttk样式表 (样式名, 选项)
+_MODERN_STYLE_OPTIONS = (
+    # 卡片样式
+    ("Card.TFrame", {
+        'background': MODERN_COLORS['bg_secondary'],
+        'relief': "solid",
+        'borderwidth': 1,
+    }),
+    # 现代化标签框架
+    ("Modern.TLabelFrame", {
+        'background': MODERN_COLORS['bg_secondary'],
+        'borderwidth': 1,
+        'relief': "solid",
+    }),
+    # 现代化标签框架的标签
+    ("Modern.TLabelFrame.Label", {
+        'background': MODERN_COLORS['bg_secondary'],
+        'font': ("Arial", 11, "bold"),
+        'foreground': MODERN_COLORS['primary'],
+    }),
+    # 现代化标签
+    ("Title.TLabel", {
+        'background': MODERN_COLORS['bg_secondary'],
+        'font': ("Arial", 14, "bold"),
+        'foreground': MODERN_COLORS['dark'],
+    }),
+    ("Subtitle.TLabel", {
+        'background': MODERN_COLORS['bg_secondary'],
+        'font': ("Arial", 10),
+        'foreground': MODERN_COLORS['dark_gray'],
+    }),
+    ("Status.TLabel", {
+        'background': MODERN_COLORS['bg_secondary'],
+        'font': ("Arial", 9),
+        'foreground': MODERN_COLORS['gray'],
+    }),
+    # 现代化输入框
+    ("Modern.TEntry", {
+        'fieldbackground': MODERN_COLORS['white'],
+        'borderwidth': 2,
+        'focuscolor': MODERN_COLORS['primary'],
+        'relief': "solid",
+    }),
+    # 现代化按钮基础样式
+    ("Modern.TButton", {
+        'padding': (15, 8),
+        'font': ("Arial", 10),
+        'relief': "flat",
+        'borderwidth': 0,
+    }),
+)
+
+# Tcl解释器中的标记变量，样式已配置过的解释器不再重复配置
+_STYLES_DONE_VAR = "::android_auto_modern_styles_done"
+
+
+def _tcl_value(value):
+    """将样式选项值转换为Tcl脚本中的字面量"""
+    if isinstance(value, tuple):
+        return "{" + " ".join(str(item) for item in value) + "}"
+    return str(value)
+
+
 def setup_modern_styles():
     """设置现代化界面样式"""
     style = ttk.Style()
     
+    # 样式属于Tcl解释器，每个解释器只需配置一次
+    if style.tk.getboolean(style.tk.call('info', 'exists', _STYLES_DONE_VAR)):
+        return
+    
     # 设置主题
     try:
         style.theme_use('alt')
     except:
         pass
     
-    # 卡片样式
-    style.configure("Card.TFrame",
-                   background=MODERN_COLORS['bg_secondary'],
-                   relief="solid",
-                   borderwidth=1)
-    
-    # 现代化标签框架
-    style.configure("Modern.TLabelFrame",
-                   background=MODERN_COLORS['bg_secondary'],
-                   borderwidth=1,
-                   relief="solid")
-    
-    # 现代化标签框架的标签
-    style.configure("Modern.TLabelFrame.Label",
-                   background=MODERN_COLORS['bg_secondary'],
-                   font=("Arial", 11, "bold"),
-                   foreground=MODERN_COLORS['primary'])
-    
-    # 现代化标签
-    style.configure("Title.TLabel",
-                   background=MODERN_COLORS['bg_secondary'],
-                   font=("Arial", 14, "bold"),
-                   foreground=MODERN_COLORS['dark'])
-    
-    style.configure("Subtitle.TLabel",
-                   background=MODERN_COLORS['bg_secondary'],
-                   font=("Arial", 10),
-                   foreground=MODERN_COLORS['dark_gray'])
-    
-    style.configure("Status.TLabel",
-                   background=MODERN_COLORS['bg_secondary'],
-                   font=("Arial", 9),
-                   foreground=MODERN_COLORS['gray'])
-    
-    # 现代化输入框
-    style.configure("Modern.TEntry",
-                   fieldbackground=MODERN_COLORS['white'],
-                   borderwidth=2,
-                   focuscolor=MODERN_COLORS['primary'],
-                   relief="solid")
-    
-    # 现代化按钮基础样式
-    style.configure("Modern.TButton",
-                   padding=(15, 8),
-                   font=("Arial", 10),
-                   relief="flat",
-                   borderwidth=0)
+    # 合并为一条Tcl脚本，一次调用完成所有样式配置
+    script = "\n".join(
+        f"ttk::style configure {name} "
+        + " ".join(f"-{option} {_tcl_value(value)}" for option, value in options.items())
+        for name, options in _MODERN_STYLE_OPTIONS
+    )
+    style.tk.eval(f"{script}\nset {_STYLES_DONE_VAR} 1")
 
 def create_card_frame(parent, title=None, padding="15"):
     """创建现代化卡片式框架"""
@@ -127,25 +281,26 @@ def create_gradient_canvas(parent, color1, color2, width=400, height=100):
     """创建渐变背景画布"""
     canvas = tk.Canvas(parent, width=width, height=height, highlightthickness=0)
     
-    # 创建渐变效果
-    for i in range(height):
-        # 计算渐变比例
-        ratio = i / height
-        
-        # 计算颜色值
-        r1, g1, b1 = hex_to_rgb(color1)
-        r2, g2, b2 = hex_to_rgb(color2)
-        
-        r = int(r1 * (1 - ratio) + r2 * ratio)
-        g = int(g1 * (1 - ratio) + g2 * ratio)
-        b = int(b1 * (1 - ratio) + b2 * ratio)
-        
-        color = f"#{r:02x}{g:02x}{b:02x}"
-        
-        canvas.create_line(0, i, width, i, fill=color, width=1)
+    # 起止颜色只解析一次
+    r1, g1, b1 = hex_to_rgb(color1)
+    r2, g2, b2 = hex_to_rgb(color2)
+    
+    # 预先计算每一行的颜色（渐变比例 t = i / height）
+    row_colors = [
+        f"{{#{int(r1 * (1 - t) + r2 * t):02x}{int(g1 * (1 - t) + g2 * t):02x}{int(b1 * (1 - t) + b2 * t):02x}}}"
+        for t in (i / height for i in range(height))
+    ]
+    
+    # 一次put写入整张图片：每行一个像素，由Tk横向平铺填满宽度
+    image = tk.PhotoImage(width=width, height=height)
+    if row_colors:
+        image.put(" ".join(row_colors), to=(0, 0, width, height))
+    canvas.create_image(0, 0, anchor="nw", image=image)
+    canvas.image = image  # 保持引用，避免图片被回收
     
     return canvas
 
+@lru_cache(maxsize=128)
 def hex_to_rgb(hex_color):
     """将十六进制颜色转换为RGB"""
     hex_color = hex_color.lstrip('#')
@@ -154,67 +309,19 @@ def hex_to_rgb(hex_color):
 def create_icon_button(parent, icon, text, command, style_type="primary", **kwargs):
     """创建带图标的现代化按钮"""
     # 选择样式
-    styles = {
-        'primary': {
-            'bg': MODERN_COLORS['primary'],
-            'fg': MODERN_COLORS['white'],
-            'activebackground': MODERN_COLORS['primary_dark'],
-            'activeforeground': MODERN_COLORS['white'],
-        },
-        'success': {
-            'bg': MODERN_COLORS['success'],
-            'fg': MODERN_COLORS['white'],
-            'activebackground': '#38a169',
-            'activeforeground': MODERN_COLORS['white'],
-        },
-        'warning': {
-            'bg': MODERN_COLORS['warning'],
-            'fg': MODERN_COLORS['white'],
-            'activebackground': '#dd7a1f',
-            'activeforeground': MODERN_COLORS['white'],
-        },
-        'danger': {
-            'bg': MODERN_COLORS['danger'],
-            'fg': MODERN_COLORS['white'],
-            'activebackground': '#e53e3e',
-            'activeforeground': MODERN_COLORS['white'],
-        },
-        'secondary': {
-            'bg': MODERN_COLORS['white'],
-            'fg': MODERN_COLORS['dark'],
-            'activebackground': MODERN_COLORS['light_gray'],
-            'activeforeground': MODERN_COLORS['dark'],
-        }
-    }
-    
-    style_config = styles.get(style_type, styles['primary'])
-    
-    # 基础样式
-    base_style = {
-        'font': ('Arial', 10, 'bold'),
-        'relief': 'flat',
-        'bd': 0,
-        'padx': 15,
-        'pady': 10,
-        'cursor': 'hand2',
-        'text': f"{icon} {text}" if icon else text
-    }
+    style_config = _ICON_BUTTON_STYLES.get(style_type, _ICON_BUTTON_STYLES['primary'])
     
     # 合并样式
+    base_style = dict(_ICON_BUTTON_BASE_STYLE, text=f"{icon} {text}" if icon else text)
     base_style.update(style_config)
     base_style.update(kwargs)
     
     button = tk.Button(parent, command=command, **base_style)
     
-    # 添加悬停效果
-    def on_enter(e):
-        button.config(bg=style_config['activebackground'])
-    
-    def on_leave(e):
-        button.config(bg=style_config['bg'])
-    
-    button.bind("<Enter>", on_enter)
-    button.bind("<Leave>", on_leave)
+    # 添加悬停效果：直接绑定Tcl脚本，由Tk处理，不回调Python
+    # （Windows下activebackground只在按下时生效，因此仍需绑定悬停事件）
+    button.bind("<Enter>", f"%W configure -background {style_config['activebackground']}")
+    button.bind("<Leave>", f"%W configure -background {style_config['bg']}")
     
     return button
 
@@ -256,12 +363,20 @@ def set_buttons_state(buttons, enabled):
     state = "normal" if enabled else "disabled"
     
     if isinstance(buttons, (list, tuple)):
-        for button in buttons:
-            if button:
+        buttons = [button for button in buttons if button]
+        if not buttons:
+            return
+        
+        # 合并为一条Tcl脚本，一次调用完成所有按钮的状态设置
+        try:
+            script = "\n".join(f"{button._w} configure -state {state}" for button in buttons)
+            buttons[0].tk.eval(script)
+        except (AttributeError, tk.TclError):
+            for button in buttons:
                 button.config(state=state)
-    else:
-        if buttons:
-            buttons.config(state=state)
+    elif buttons:
+        # 与列表分支一致，统一通过configure -state设置
+        buttons.config(state=state)
 
 
 def open_url(url):
@@ -274,39 +389,30 @@ def open_url(url):
 
 def open_directory(path):
     """打开目录"""
+    abs_path = os.path.abspath(path)
     try:
-        abs_path = os.path.abspath(path)
-        if os.path.exists(abs_path):
+        if sys.platform == 'win32':
+            # 路径不存在时 os.startfile 会抛出 OSError
             os.startfile(abs_path)
         else:
-            print(f"目录不存在: {abs_path}")
-    except Exception as e:
-        try:
-            # Linux/Mac
-            os.system(f'open "{os.path.abspath(path)}"')
-        except Exception as e2:
-            print(f"无法打开目录 {path}: {e}, {e2}")
+            # Linux/Mac：直接启动文件管理器，不经过shell，也不等待其返回
+            subprocess.Popen(
+                ['open' if sys.platform == 'darwin' else 'xdg-open', abs_path],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+    except OSError as e:
+        print(f"无法打开目录 {abs_path}: {e}")
 
 
 def format_log_message(message):
     """格式化日志消息"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    return f"[{timestamp}] {message}\n"
+    return f"[{time.strftime('%H:%M:%S')}] {message}\n"
 
 
 def safe_filename(text, max_length=30):
     """生成安全的文件名"""
-    # 替换非法字符
-    illegal_chars = ['/', '\\', ':', '*', '?', '"', '<', '>', '|']
-    safe_text = text
-    for char in illegal_chars:
-        safe_text = safe_text.replace(char, '_')
-    
-    # 限制长度
-    if len(safe_text) > max_length:
-        safe_text = safe_text[:max_length]
-    
-    return safe_text
+    # 替换非法字符并限制长度
+    return text.translate(_ILLEGAL_FILENAME_TABLE)[:max_length]
 
 
 def create_labeled_entry(parent, label_text, variable=None, **kwargs):
@@ -350,12 +456,17 @@ def create_button_frame(parent, buttons_config):
         tuple: (frame, buttons_list)
     """
     frame = ttk.Frame(parent)
-    buttons = []
-    
-    for i, (text, command, style) in enumerate(buttons_config):
-        button = ttk.Button(frame, text=text, command=command, style=style)
-        button.grid(row=0, column=i, padx=(0 if i == 0 else 5, 0))
-        buttons.append(button)
+    buttons = [
+        ttk.Button(frame, text=text, command=command, style=style)
+        for text, command, style in buttons_config
+    ]
+    
+    # 所有按钮创建完成后，合并为一条Tcl脚本完成布局
+    if buttons:
+        frame.tk.eval("\n".join(
+            f"grid {button._w} -row 0 -column {i} -padx {{{0 if i == 0 else 5} 0}}"
+            for i, button in enumerate(buttons)
+        ))
     
     return frame, buttons
 
@@ -388,86 +499,9 @@ def validate_directory_path(dir_path):
 
 def create_custom_button(parent, text, command, style_type="action", **kwargs):
     """创建自定义按钮，确保有背景色"""
-    import tkinter as tk
-    
-    # 定义按钮样式
-    styles = {
-        'action': {
-            'bg': '#1565C0',
-            'fg': '#FFFFFF',
-            'activebackground': '#0D47A1',
-            'activeforeground': '#FFFFFF',
-            'font': ('Arial', 10, 'bold'),
-            'relief': 'raised',
-            'bd': 2,
-            'padx': 15,
-            'pady': 8,
-            'cursor': 'hand2'
-        },
-        'warning': {
-            'bg': '#FF9800',
-            'fg': '#FFFFFF',
-            'activebackground': '#E68900',
-            'activeforeground': '#FFFFFF',
-            'font': ('Arial', 9, 'bold'),
-            'relief': 'raised',
-            'bd': 2,
-            'padx': 10,
-            'pady': 6,
-            'cursor': 'hand2'
-        },
-        'success': {
-            'bg': '#4CAF50',
-            'fg': '#FFFFFF',
-            'activebackground': '#45A049',
-            'activeforeground': '#FFFFFF',
-            'font': ('Arial', 9, 'bold'),
-            'relief': 'raised',
-            'bd': 2,
-            'padx': 10,
-            'pady': 6,
-            'cursor': 'hand2'
-        },
-        'danger': {
-            'bg': '#F44336',
-            'fg': '#FFFFFF',
-            'activebackground': '#D32F2F',
-            'activeforeground': '#FFFFFF',
-            'font': ('Arial', 9, 'bold'),
-            'relief': 'raised',
-            'bd': 2,
-            'padx': 10,
-            'pady': 6,
-            'cursor': 'hand2'
-        },
-        'config': {
-            'bg': '#FFFFFF',
-            'fg': '#333333',
-            'activebackground': '#FFFFFF',
-            'activeforeground': '#333333',
-            'font': ('Arial', 9),
-            'relief': 'raised',
-            'bd': 1,
-            'padx': 8,
-            'pady': 4,
-            'cursor': 'hand2'
-        },
-        'default': {
-            'bg': '#FFFFFF',
-            'fg': '#333333',
-            'activebackground': '#FFFFFF',
-            'activeforeground': '#333333',
-            'font': ('Arial', 9),
-            'relief': 'raised',
-            'bd': 1,
-            'padx': 8,
-            'pady': 6,
-            'cursor': 'hand2'
-        }
-    }
-    
-    style_config = styles.get(style_type, styles['default'])
-    style_config.update(kwargs)
+    style_config = _CUSTOM_BUTTON_STYLES.get(style_type, _CUSTOM_BUTTON_STYLES['default'])
+    if kwargs:
+        style_config = {**style_config, **kwargs}
     
     # 创建tkinter Button而不是ttk Button
     button = tk.Button(
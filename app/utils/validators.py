@@ -7,7 +7,14 @@
 
 import re
 import os
-import pandas as pd
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+
+# 预编译的格式校验正则
+_API_KEY_RE = re.compile(r'^[a-zA-Z0-9_\-\.]+$')
+_DEVICE_ID_RE = re.compile(r'^[a-zA-Z0-9_\-:\.]+$')
+_PACKAGE_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9_]*(\.[a-zA-Z][a-zA-Z0-9_]*)*$')
 
 
 def validate_api_key(api_key):
@@ -19,7 +26,7 @@ def validate_api_key(api_key):
         return False, "API Key长度过短"
     
     # 简单的格式检查
-    if not re.match(r'^[a-zA-Z0-9_\-\.]+$', api_key):
+    if not _API_KEY_RE.match(api_key):
         return False, "API Key格式不正确"
     
     return True, "API Key格式正确"
@@ -31,7 +38,7 @@ def validate_device_id(device_id):
         return True, "设备ID为空，将使用默认设备"
     
     # 设备ID通常是字母数字组合
-    if not re.match(r'^[a-zA-Z0-9_\-:\.]+$', device_id):
+    if not _DEVICE_ID_RE.match(device_id):
         return False, "设备ID格式不正确"
     
     return True, "设备ID格式正确"
@@ -42,15 +49,18 @@ def validate_max_steps(max_steps_str):
     if not max_steps_str:
         return False, "最大执行次数不能为空"
     
-    try:
-        max_steps = int(max_steps_str)
-        if max_steps < 1:
-            return False, "最大执行次数必须大于0"
-        if max_steps > 1000:
-            return False, "最大执行次数不能超过1000"
-        return True, f"最大执行次数: {max_steps}"
-    except ValueError:
+    # 先做字符检查，避免输入过程中频繁以异常处理非数字输入
+    text = str(max_steps_str).strip()
+    digits = text[1:] if text[:1] in ('+', '-') else text
+    if not digits.isdecimal():
         return False, "最大执行次数必须是数字"
+    
+    max_steps = int(text)
+    if max_steps < 1:
+        return False, "最大执行次数必须大于0"
+    if max_steps > 1000:
+        return False, "最大执行次数不能超过1000"
+    return True, f"最大执行次数: {max_steps}"
 
 
 def validate_task_description(task):
@@ -67,25 +77,94 @@ def validate_task_description(task):
     return True, "任务描述有效"
 
 
-def validate_excel_file(file_path):
-    """验证Excel文件"""
+def _check_excel_path(file_path):
+    """检查Excel文件路径（不打开文件），有问题时返回错误信息，否则返回None"""
     if not file_path:
-        return False, "请选择Excel文件"
-    
-    if not os.path.exists(file_path):
-        return False, f"文件不存在: {file_path}"
+        return "请选择Excel文件"
     
     if not file_path.lower().endswith(('.xlsx', '.xls')):
-        return False, "文件格式不正确，请选择Excel文件（.xlsx或.xls）"
+        return "文件格式不正确，请选择Excel文件（.xlsx或.xls）"
+    
+    if not os.path.exists(file_path):
+        return f"文件不存在: {file_path}"
+    
+    return None
+
+
+def _normalize_headers(values):
+    """按pandas读取表头的规则整理openpyxl读出的表头行，保证两种读取方式得到相同的列名"""
+    values = list(values)
+    # pandas会忽略表头行末尾的空单元格
+    while values and (values[-1] is None or values[-1] == ''):
+        values.pop()
+    
+    # 统一为字符串，空单元格命名为 "Unnamed: 列序号"
+    names = [
+        f"Unnamed: {i}" if value is None or value == '' else str(value)
+        for i, value in enumerate(values)
+    ]
+    
+    # 重复列名依次追加 .1、.2 ...，跳过表头中已存在的名称
+    existing = set(names)
+    counts = defaultdict(int)
+    for i, name in enumerate(names):
+        cur_count = counts[name]
+        if cur_count > 0:
+            base = name
+            while cur_count > 0:
+                counts[base] = cur_count + 1
+                name = f"{base}.{cur_count}"
+                cur_count = cur_count + 1 if name in existing else counts[name]
+            names[i] = name
+        counts[name] = cur_count + 1
+    return tuple(names)
+
+
+@lru_cache(maxsize=8)
+def _load_sheet_headers(abs_path, mtime):
+    """读取所有工作表的表头行（不加载数据），返回只读映射 {工作表名: 表头元组}"""
+    # 以 (路径, 修改时间) 为缓存键，文件被修改后自动重新读取
+    if abs_path.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(abs_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            return MappingProxyType({
+                name: _normalize_headers(next(workbook[name].iter_rows(max_row=1, values_only=True), ()))
+                for name in workbook.sheetnames
+            })
+        finally:
+            workbook.close()
+    
+    # 非xlsx文件（如.xls）退回pandas读取，pandas导入开销较大，仅在此处导入
+    import pandas as pd
+    with pd.ExcelFile(abs_path) as excel_file:
+        return MappingProxyType({
+            name: tuple(str(col) for col in pd.read_excel(excel_file, sheet_name=name, nrows=0).columns)
+            for name in excel_file.sheet_names
+        })
+
+
+def get_sheet_headers(file_path):
+    """获取Excel文件各工作表的表头（带缓存）"""
+    abs_path = os.path.abspath(file_path)
+    return _load_sheet_headers(abs_path, os.path.getmtime(abs_path))
+
+
+def validate_excel_file(file_path):
+    """验证Excel文件"""
+    error = _check_excel_path(file_path)
+    if error:
+        return False, error
     
     try:
         # 尝试读取文件
-        excel_file = pd.ExcelFile(file_path)
-        if not excel_file.sheet_names:
-            return False, "Excel文件没有工作表"
-        return True, f"Excel文件有效，包含 {len(excel_file.sheet_names)} 个工作表"
+        sheet_headers = get_sheet_headers(file_path)
     except Exception as e:
         return False, f"无法读取Excel文件: {e}"
+    
+    if not sheet_headers:
+        return False, "Excel文件没有工作表"
+    return True, f"Excel文件有效，包含 {len(sheet_headers)} 个工作表"
 
 
 def validate_sheet_selection(sheet_vars):
@@ -93,11 +172,12 @@ def validate_sheet_selection(sheet_vars):
     if not sheet_vars:
         return False, "没有可用的工作表"
     
-    selected_sheets = [sheet for sheet, var in sheet_vars.items() if var.get()]
-    if not selected_sheets:
+    # 只需统计数量，无需构建工作表名列表；每个变量只读取一次
+    selected_count = sum(1 for var in sheet_vars.values() if var.get())
+    if not selected_count:
         return False, "请至少选择一个工作表"
     
-    return True, f"已选择 {len(selected_sheets)} 个工作表"
+    return True, f"已选择 {selected_count} 个工作表"
 
 
 def validate_column_selection(excel_path, sheet_name, column_name):
@@ -106,8 +186,7 @@ def validate_column_selection(excel_path, sheet_name, column_name):
         return False, "请选择要处理的列"
     
     try:
-        df = pd.read_excel(excel_path, sheet_name=sheet_name, nrows=0)
-        if column_name not in df.columns:
+        if column_name not in get_sheet_headers(excel_path)[sheet_name]:
             return False, f"工作表 '{sheet_name}' 中不存在列 '{column_name}'"
         return True, f"列 '{column_name}' 存在"
     except Exception as e:
@@ -123,7 +202,7 @@ def validate_app_package_mapping(app_name, package_name):
         return False, "包名不能为空"
     
     # 验证包名格式（简单检查）
-    if not re.match(r'^[a-zA-Z][a-zA-Z0-9_]*(\.[a-zA-Z][a-zA-Z0-9_]*)*$', package_name):
+    if not _PACKAGE_RE.match(package_name):
         return False, "包名格式不正确（应为com.example.app格式）"
     
     return True, "应用包名映射有效"
@@ -144,17 +223,16 @@ def validate_batch_execution_params(excel_path, selected_sheets, target_column):
     if not target_column:
         return False, "请选择要处理的列"
     
-    # 验证每个sheet中是否存在目标列
+    # 验证每个sheet中是否存在目标列（表头已在验证文件时缓存）
     try:
-        excel_file = pd.ExcelFile(excel_path)
+        sheet_headers = get_sheet_headers(excel_path)
         missing_columns = []
         
         for sheet in selected_sheets:
-            if sheet not in excel_file.sheet_names:
+            if sheet not in sheet_headers:
                 return False, f"工作表 '{sheet}' 不存在"
             
-            df = pd.read_excel(excel_file, sheet_name=sheet, nrows=0)
-            if target_column not in df.columns:
+            if target_column not in sheet_headers[sheet]:
                 missing_columns.append(sheet)
         
         if missing_columns:
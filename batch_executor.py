@@ -6,17 +6,91 @@
 从Excel文件读取'示例query'列并自动执行任务
 """
 
+import multiprocessing
 import os
 import pandas as pd
-import json
+import queue
+import shutil
+import sys
+import threading
 import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from src.task_executor import TaskExecutor
 from src.config import config
+from src.json_utils import dump_json, dumps_json_line, load_json_lines, open_json_lines
 from src.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Excel读取：优先直接使用calamine（Rust实现，速度快、内存占用低，不构建pandas/openpyxl对象），
+# 未安装时退回pandas默认引擎
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+# 可选：使用Parquet缓存各sheet的查询列，Excel未修改时无需重新解析
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# 需要读取的查询列
+_QUERY_COLUMN = '示例query'
+
+# Parquet缓存目录（位于Excel文件所在目录下）
+_PARQUET_CACHE_DIR = ".xlsx_cache"
+
+# 目录名中的非法字符替换表
+_SAFE_TABLE = str.maketrans({c: '_' for c in '/\\:|*?"<>'})
+
+# 失败查询记录文件（位于批量输出目录下，逐条追加）
+_FAILED_QUERIES_FILE = "failed_queries.jsonl"
+
+# 查询成功后写入输出目录的标记文件（内容为完整查询文本），续跑时据此跳过已完成的查询
+_SUCCESS_MARKER = "_SUCCESS"
+
+# 并行工作进程绑定的设备ID及其任务执行器（每个进程各自持有）
+_worker_device_id = None
+_worker_executor = None
+
+
+def _init_sheet_worker(device_queue):
+    """并行工作进程初始化：领取一台设备，后续任务都连接这台设备"""
+    global _worker_device_id
+    _worker_device_id = device_queue.get()
+    config.device_id = _worker_device_id
+
+
+def _run_sheet_worker(df, sheet_name, output_base_dir, task_output_base_dir, resume, compress):
+    """在工作进程中处理单个sheet（df为主进程已读取的查询列），返回 (成功数, 总数, 失败的查询)"""
+    global _worker_executor
+    
+    # 每台设备使用独立的任务输出目录，避免相同query的输出互相覆盖
+    batch_executor = BatchExecutor(
+        task_output_base_dir=os.path.join(task_output_base_dir, _worker_device_id.replace(':', '_'))
+    )
+    batch_executor.output_base_dir = output_base_dir
+    batch_executor.resume = resume
+    batch_executor.compress = compress
+    
+    # 同一进程处理多个sheet时复用任务执行器
+    if _worker_executor is None:
+        _worker_executor = TaskExecutor(output_base_dir=batch_executor.task_output_base_dir)
+    
+    try:
+        batch_executor._process_sheet(df, sheet_name, _worker_executor)
+    finally:
+        # 等待后台输出整理完成后释放线程池
+        batch_executor._wait_pending_io()
+        batch_executor._io_pool.shutdown(wait=True)
+    
+    return batch_executor.success_count, batch_executor.total_count, batch_executor.failed_queries
+
+
 class BatchExecutor:
     """批量任务执行器 - 专门处理示例query"""
     
@@ -25,7 +99,19 @@ class BatchExecutor:
         self.target_sheets = ['爱奇艺', '懂车帝', '美团外卖', '饿了么']
         self.output_base_dir = "batch_output_0701"
         self.task_output_base_dir = task_output_base_dir  # 单个任务的输出基础目录
-        self.failed_queries = []
+        self.executor = None  # 所有sheet共用的任务执行器
+        self._device_executors = None  # 多台设备时每台设备一个任务执行器
+        self._state_lock = threading.Lock()  # 并发执行查询时保护统计和结果记录
+        self.resume = False  # 续跑模式：跳过进度文件中已成功的查询
+        self.compress = False  # 以zstd压缩保存结果和报告（需安装zstandard）
+        self.device_ids = []  # 多台设备时按sheet并行执行，每个进程使用一台设备
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch_io")
+        self._io_futures = []  # 后台整理输出目录的任务
+        self._output_locks = {}  # 目标目录 -> 锁，避免同一目录被两个后台任务同时写入
+        self._output_locks_guard = threading.Lock()
+        self.failed_queries = []  # 未打开失败记录文件时（如并行工作进程）暂存的失败查询
+        self.failed_count = 0
+        self._failed_fp = None  # 失败查询记录文件，失败的查询逐条写入，不在内存中累积
         self.success_count = 0
         self.total_count = 0
         self.start_time = None
@@ -36,7 +122,7 @@ class BatchExecutor:
         logger.info("🚀 批量任务执行器")
         logger.info("=" * 60)
         
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         
         # 创建输出目录
         os.makedirs(self.output_base_dir, exist_ok=True)
@@ -48,27 +134,47 @@ class BatchExecutor:
         
         logger.info(f"📊 正在读取Excel文件: {self.excel_file}")
         
+        self._failed_fp = open(os.path.join(self.output_base_dir, _FAILED_QUERIES_FILE), "wb")
+        
         # 读取Excel文件
         try:
-            excel_data = pd.ExcelFile(self.excel_file)
-            logger.info(f"📋 发现sheets: {excel_data.sheet_names}")
-            
-            # 检查目标sheets是否存在
-            available_sheets = [sheet for sheet in self.target_sheets if sheet in excel_data.sheet_names]
-            missing_sheets = [sheet for sheet in self.target_sheets if sheet not in excel_data.sheet_names]
-            
-            if missing_sheets:
-                logger.warning(f"⚠️  以下sheets不存在: {missing_sheets}")
-            
-            if not available_sheets:
-                logger.error("❌ 没有找到任何目标sheets")
-                return False
-            
-            logger.info(f"✅ 将处理以下sheets: {available_sheets}")
+            excel_data = self._open_workbook()
+            try:
+                logger.info(f"📋 发现sheets: {excel_data.sheet_names}")
+                
+                # 检查目标sheets是否存在
+                sheet_set = set(excel_data.sheet_names)
+                available_sheets = [sheet for sheet in self.target_sheets if sheet in sheet_set]
+                missing_sheets = [sheet for sheet in self.target_sheets if sheet not in sheet_set]
+                
+                if missing_sheets:
+                    logger.warning(f"⚠️  以下sheets不存在: {missing_sheets}")
+                
+                if not available_sheets:
+                    logger.error("❌ 没有找到任何目标sheets")
+                    return False
+                
+                logger.info(f"✅ 将处理以下sheets: {available_sheets}")
+                
+                # 一次读取所有目标sheet的查询列
+                frames = self._read_query_columns(excel_data, available_sheets)
+            finally:
+                # 查询已全部读出，执行前关闭工作簿，长时间执行期间不再占用其内存
+                self._close_workbook(excel_data)
+                del excel_data
             
-            # 逐个处理sheet
-            for sheet_name in available_sheets:
-                self._process_sheet(excel_data, sheet_name)
+            if len(self.device_ids) > 1 and len(frames) > 1:
+                # 多台设备：各sheet输出目录互不相关，按sheet并行处理
+                self._process_sheets_parallel(frames)
+            else:
+                # 创建任务执行器（所有sheet共用，避免重复初始化设备连接和AI分析器）；
+                # 多台设备时由各设备的执行器并发执行查询
+                if self.executor is None and not self._get_device_executors():
+                    self.executor = TaskExecutor(output_base_dir=self.task_output_base_dir)
+                
+                # 逐个处理sheet
+                for sheet_name, df in frames.items():
+                    self._process_sheet(df, sheet_name, self.executor)
             
             # 生成执行报告
             self._generate_report()
@@ -76,26 +182,54 @@ class BatchExecutor:
         except Exception as e:
             logger.error(f"❌ 读取Excel文件失败: {e}")
             return False
+        finally:
+            # 等待后台输出整理完成后释放线程池
+            self._wait_pending_io()
+            self._io_pool.shutdown(wait=True)
+            self._close_executors()
+            self._failed_fp.close()
+            self._failed_fp = None
         
         return True
     
-    def _process_sheet(self, excel_data, sheet_name):
-        """处理单个sheet"""
+    def _process_sheets_parallel(self, frames):
+        """使用多台设备并行处理sheets（frames为 {sheet名: 查询列}），每个工作进程绑定一台设备"""
+        workers = min(len(self.device_ids), len(frames))
+        logger.info(f"⚡ 使用 {workers} 台设备并行处理sheets: {self.device_ids[:workers]}")
+        
+        device_queue = multiprocessing.Queue()
+        for device_id in self.device_ids[:workers]:
+            device_queue.put(device_id)
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sheet_worker,
+                                 initargs=(device_queue,)) as pool:
+            futures = {
+                pool.submit(_run_sheet_worker, df, sheet_name, self.output_base_dir,
+                            self.task_output_base_dir, self.resume, self.compress): sheet_name
+                for sheet_name, df in frames.items()
+            }
+            
+            # 汇总各sheet的执行结果
+            for future in as_completed(futures):
+                sheet_name = futures[future]
+                try:
+                    success_count, total_count, failed_queries = future.result()
+                except Exception as e:
+                    logger.error(f"❌ 处理sheet {sheet_name} 失败: {e}")
+                    continue
+                
+                self.success_count += success_count
+                self.total_count += total_count
+                for query_info in failed_queries:
+                    self._record_failure(query_info)
+                logger.info(f"✅ sheet {sheet_name} 完成: {success_count}/{total_count}")
+    
+    def _process_sheet(self, df, sheet_name, executor):
+        """处理单个sheet（df为已读取的查询列）"""
         logger.info(f"\n📑 处理sheet: {sheet_name}")
         
         try:
-            # 读取sheet数据
-            df = pd.read_excel(excel_data, sheet_name=sheet_name)
             logger.info(f"📊 数据行数: {len(df)}")
-            logger.info(f"📋 列名: {list(df.columns)}")
-            
-            # 检查必要的列是否存在
-            required_columns = ['示例query']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                logger.error(f"❌ 缺少必要的列: {missing_columns}")
-                return
             
             # 为这个sheet创建输出目录
             sheet_output_dir = os.path.join(self.output_base_dir, sheet_name)
@@ -106,190 +240,503 @@ class BatchExecutor:
             logger.info(f"📝 从{sheet_name}提取到 {len(all_queries)} 个示例查询")
             
             # 执行queries
-            self._execute_queries(all_queries, sheet_name, sheet_output_dir)
+            self._execute_queries(all_queries, sheet_name, sheet_output_dir, executor)
             
         except Exception as e:
             logger.error(f"❌ 处理sheet {sheet_name} 失败: {e}")
     
+    def _read_query_columns(self, excel_data, sheet_names):
+        """一次读取多个sheet的查询列，返回 {sheet名: DataFrame}（缺少查询列的sheet不包含在内）"""
+        frames = {}
+        uncached = []
+        for sheet_name in sheet_names:
+            df = self._load_cached_query_column(sheet_name)
+            if df is None:
+                uncached.append(sheet_name)
+            else:
+                frames[sheet_name] = df
+        
+        if uncached and CalamineWorkbook is not None and isinstance(excel_data, CalamineWorkbook):
+            for sheet_name in uncached:
+                df = self._read_query_column_calamine(excel_data, sheet_name)
+                if df is None:
+                    logger.error(f"❌ sheet {sheet_name} 缺少必要的列: {[_QUERY_COLUMN]}")
+                    continue
+                self._save_cached_query_column(sheet_name, df)
+                frames[sheet_name] = df
+        elif uncached:
+            # 只读取查询列，不为其他列构建数据；所有sheet在一次调用中读取
+            read_kwargs = {'usecols': [_QUERY_COLUMN], 'dtype': {_QUERY_COLUMN: "string"}}
+            try:
+                loaded = pd.read_excel(excel_data, sheet_name=uncached, **read_kwargs)
+            except ValueError:
+                # usecols中的列不存在时pandas抛出ValueError，逐个读取找出缺少查询列的sheet
+                loaded = {}
+                for sheet_name in uncached:
+                    try:
+                        loaded[sheet_name] = pd.read_excel(excel_data, sheet_name=sheet_name, **read_kwargs)
+                    except ValueError:
+                        logger.error(f"❌ sheet {sheet_name} 缺少必要的列: {[_QUERY_COLUMN]}")
+            
+            for sheet_name, df in loaded.items():
+                self._save_cached_query_column(sheet_name, df)
+            frames.update(loaded)
+        
+        # 保持sheet的原有顺序
+        return {sheet_name: frames[sheet_name] for sheet_name in sheet_names if sheet_name in frames}
+    
+    def _open_workbook(self):
+        """打开Excel文件：已安装calamine时直接使用calamine，否则使用pandas"""
+        if CalamineWorkbook is not None:
+            return CalamineWorkbook.from_path(self.excel_file)
+        return pd.ExcelFile(self.excel_file)
+    
+    def _close_workbook(self, workbook):
+        """关闭Excel文件（旧版本calamine的工作簿没有close方法，释放引用即可）"""
+        close = getattr(workbook, 'close', None)
+        if close is not None:
+            close()
+    
+    def _read_query_column_calamine(self, workbook, sheet_name):
+        """使用calamine直接读取sheet的查询列，返回单列DataFrame，缺少查询列时返回None"""
+        # 不跳过空白区域，与pandas一样以第一行为表头
+        rows = workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+        header = rows[0] if rows else []
+        if _QUERY_COLUMN not in header:
+            return None
+        
+        column = header.index(_QUERY_COLUMN)
+        values = []
+        for row in rows[1:]:
+            value = row[column]
+            if value == "" or value is None:
+                value = None  # 空单元格记为缺失值
+            elif isinstance(value, float) and value.is_integer():
+                value = str(int(value))  # 与pandas一致，整数不带小数点
+            else:
+                value = str(value)
+            values.append(value)
+        return pd.DataFrame({_QUERY_COLUMN: pd.array(values, dtype="string")})
+    
+    def _query_cache_file(self, sheet_name):
+        """sheet查询列的Parquet缓存文件路径"""
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(self.excel_file)), _PARQUET_CACHE_DIR)
+        return os.path.join(cache_dir, f"{os.path.basename(self.excel_file)}.{sheet_name}.parquet")
+    
+    def _load_cached_query_column(self, sheet_name):
+        """读取Parquet缓存的查询列（缓存比Excel文件新时有效），无可用缓存时返回None"""
+        if pq is None:
+            return None
+        
+        cache_file = self._query_cache_file(sheet_name)
+        try:
+            if os.path.getmtime(cache_file) < os.path.getmtime(self.excel_file):
+                return None
+            df = pq.read_table(cache_file, columns=[_QUERY_COLUMN]).to_pandas()
+        except (OSError, ValueError):
+            return None  # 缓存不存在或不可读，重新解析Excel
+        
+        logger.info(f"⚡ 使用缓存的sheet数据: {cache_file}")
+        return df
+    
+    def _save_cached_query_column(self, sheet_name, df):
+        """将sheet的查询列写入Parquet缓存"""
+        if pq is None:
+            return
+        
+        cache_file = self._query_cache_file(sheet_name)
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            # 先写临时文件再替换，避免中断时留下不完整的缓存
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_file, compression="zstd")
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            logger.warning(f"⚠️  写入sheet缓存失败: {e}")
+    
     def _extract_queries_from_sheet(self, df):
         """从sheet中提取所有queries（只处理示例query）"""
+        # 直接遍历底层数组，避免pandas逐元素的额外开销
         all_queries = []
+        strip = str.strip
         
-        for index, row in df.iterrows():
-            # 只处理示例query
-            example_query = row.get('示例query')
-            if pd.notna(example_query) and str(example_query).strip():
-                all_queries.append({
-                    'query': str(example_query).strip(),
-                    'type': '示例query',
-                    'row': index + 1
-                })
+        for row, value in enumerate(df[_QUERY_COLUMN].to_numpy(dtype=object, na_value=None), 1):
+            # value != value 用于判断NaN
+            if value is None or value != value:
+                continue
+            query = strip(str(value))
+            if query:
+                all_queries.append({'query': query, 'type': _QUERY_COLUMN, 'row': row})
         
         return all_queries
     
-    def _execute_queries(self, queries, sheet_name, output_dir):
+    def _execute_queries(self, queries, sheet_name, output_dir, executor):
         """执行一组queries"""
         logger.info(f"\n🔄 开始执行{sheet_name}的{len(queries)}个查询...")
         
-        # 创建任务执行器，使用指定的输出基础目录
-        executor = TaskExecutor(output_base_dir=self.task_output_base_dir)
-        
         # 记录执行结果
         execution_results = []
         
-        for i, query_info in enumerate(queries, 1):
-            query = query_info['query']
-            query_type = query_info['type']
-            row_num = query_info['row']
-            
-            logger.info(f"\n--- 执行查询 {i}/{len(queries)} ---")
-            logger.info(f"📝 查询: {query}")
-            logger.info(f"📋 类型: {query_type}")
-            logger.info(f"📍 来源行: {row_num}")
-            
-            # 每个任务独立跟踪启动的应用
-            task_launched_apps = set()
-            
-            try:
-                # 执行任务
-                start_time = time.time()
-                success = executor.run_task(query)
-                end_time = time.time()
-                execution_time = end_time - start_time
-                
-                # # 提取当前任务启动的应用
-                # if hasattr(executor, 'task_data') and executor.task_data:
-                #     self._extract_launched_apps(executor.task_data, task_launched_apps)
+        # 执行进度逐条追加到JSONL文件，中途崩溃也不会丢失已完成的结果
+        progress_file = os.path.join(output_dir, f"{sheet_name}_results.jsonl")
+        completed = self._load_completed_queries(progress_file) if self.resume else {}
+        if completed:
+            logger.info(f"⏭️  发现 {len(completed)} 个已成功的查询，将跳过")
+        
+        # 多台设备时每台设备一个任务执行器，查询并发执行
+        executors = self._get_device_executors() or [executor]
+        
+        with open_json_lines(progress_file) as progress_fp:
+            # 先筛掉已完成的查询，剩余的按顺序（或并发）执行
+            pending = []
+            for i, query_info in enumerate(queries, 1):
+                query = query_info['query']
+                query_type = query_info['type']
+                row_num = query_info['row']
                 
                 # 按query创建目标目录（限制文件名长度，避免路径过长）
-                safe_query = query[:30].replace('/', '_').replace('\\', '_').replace(':', '_').replace('|', '_')
+                safe_query = query[:30].translate(_SAFE_TABLE)
                 target_output = os.path.join(output_dir, f"{safe_query}")
                 
-                # 移动输出文件到sheet目录
-                # 使用executor的实际输出目录而不是硬编码的"output"
-                original_output = executor.output_dir
-                if os.path.exists(original_output):
-                    # 如果目标目录存在，先删除
-                    if os.path.exists(target_output):
-                        import shutil
-                        shutil.rmtree(target_output)
-                    
-                    # 移动目录
-                    import shutil
-                    shutil.move(original_output, target_output)
-                    logger.info(f"📁 输出已保存到: {target_output}")
-                
-                # 记录结果
-                result = {
-                    'query': query,
-                    'type': query_type,
-                    'row': row_num,
-                    'success': success,
-                    'execution_time': execution_time,
-                    'output_dir': target_output,
-                    'launched_apps': list(task_launched_apps),  # 记录此任务启动的应用
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                if success:
-                    logger.info(f"✅ 查询执行成功，用时 {execution_time:.1f} 秒")
+                # 续跑模式下跳过之前已成功的查询（进度文件有记录，或输出目录中有成功标记）
+                previous_result = completed.get((query, row_num))
+                if not previous_result and self.resume and self._has_success_marker(target_output, query):
+                    previous_result = {
+                        'query': query,
+                        'type': query_type,
+                        'row': row_num,
+                        'success': True,
+                        'skipped': True,
+                        'output_dir': target_output,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                if previous_result:
+                    logger.info(f"⏭️  跳过已完成的查询 {i}/{len(queries)}: {query}")
+                    execution_results.append(previous_result)
                     self.success_count += 1
-                else:
-                    logger.error(f"❌ 查询执行失败，用时 {execution_time:.1f} 秒")
-                    self.failed_queries.append(query_info)
-                
-                execution_results.append(result)
-                self.total_count += 1
-                
-                # # 停止当前任务启动的应用，为下一个任务准备
-                # logger.info(f"🛑 停止当前任务启动的应用...")
-                # if task_launched_apps:
-                #     logger.info(f"🎯 当前任务启动了 {len(task_launched_apps)} 个应用: {list(task_launched_apps)}")
-                #     executor.device.clean_apps(target_apps=list(task_launched_apps))
-                #     logger.info(f"✅ 应用已停止，为下一个任务准备")
-                # else:
-                #     logger.info("ℹ️  当前任务未启动新应用，执行常规停止")
-                #     executor.device.clean_apps()  # 仍然执行停止，确保状态干净
-                
-                # # 短暂休息，避免设备过热
-                # time.sleep(3)
+                    self.total_count += 1
+                    continue
                 
+                pending.append((i, query_info, target_output))
+            
+            try:
+                if len(executors) > 1:
+                    self._run_queries_concurrently(pending, len(queries), executors, progress_fp, execution_results)
+                else:
+                    for i, query_info, target_output in pending:
+                        self._run_query(i, len(queries), query_info, target_output, executors[0],
+                                        progress_fp, execution_results)
             except KeyboardInterrupt:
                 logger.warning(f"\n⚠️  用户中断执行")
                 # 保存中断前的结果
                 self._save_execution_results(execution_results, sheet_name, output_dir)
                 raise
-            except Exception as e:
-                logger.error(f"❌ 执行查询时出错: {e}")
-                self.failed_queries.append(query_info)
-                self.total_count += 1
-                
-                # 记录失败结果
-                result = {
-                    'query': query,
-                    'type': query_type,
-                    'row': row_num,
-                    'success': False,
-                    'error': str(e),
-                    'timestamp': datetime.now().isoformat()
-                }
-                execution_results.append(result)
-        
-        # 保存执行结果
+        
+        # 等待本sheet的输出整理完成后保存执行结果
+        self._wait_pending_io()
         self._save_execution_results(execution_results, sheet_name, output_dir)
     
+    def _run_query(self, i, total, query_info, target_output, executor, progress_fp, execution_results):
+        """使用指定的任务执行器执行单个查询，并记录结果（可在多个线程中并发调用）"""
+        query = query_info['query']
+        query_type = query_info['type']
+        row_num = query_info['row']
+        
+        logger.info(f"\n--- 执行查询 {i}/{total} ---")
+        logger.info(f"📝 查询: {query}")
+        logger.info(f"📋 类型: {query_type}")
+        logger.info(f"📍 来源行: {row_num}")
+        
+        # 每个任务独立跟踪启动的应用
+        task_launched_apps = set()
+        
+        try:
+            # 执行任务
+            start_time = time.perf_counter()
+            success = executor.run_task(query)
+            execution_time = time.perf_counter() - start_time
+            
+            # # 提取当前任务启动的应用
+            # if hasattr(executor, 'task_data') and executor.task_data:
+            #     self._extract_launched_apps(executor.task_data, task_launched_apps)
+            
+            # 移动输出文件到sheet目录
+            # 使用executor的实际输出目录而不是硬编码的"output"
+            self._replace_output(executor.output_dir, target_output, success, query)
+            
+            # 记录结果
+            result = {
+                'query': query,
+                'type': query_type,
+                'row': row_num,
+                'success': success,
+                'execution_time': execution_time,
+                'output_dir': target_output,
+                'launched_apps': list(task_launched_apps),  # 记录此任务启动的应用
+                'timestamp': datetime.now().isoformat()
+            }
+            
+            if success:
+                logger.info(f"✅ 查询执行成功，用时 {execution_time:.1f} 秒")
+            else:
+                logger.error(f"❌ 查询执行失败，用时 {execution_time:.1f} 秒")
+            
+            # # 停止当前任务启动的应用，为下一个任务准备
+            # logger.info(f"🛑 停止当前任务启动的应用...")
+            # if task_launched_apps:
+            #     logger.info(f"🎯 当前任务启动了 {len(task_launched_apps)} 个应用: {list(task_launched_apps)}")
+            #     executor.device.clean_apps(target_apps=list(task_launched_apps))
+            #     logger.info(f"✅ 应用已停止，为下一个任务准备")
+            # else:
+            #     logger.info("ℹ️  当前任务未启动新应用，执行常规停止")
+            #     executor.device.clean_apps()  # 仍然执行停止，确保状态干净
+            
+            # # 短暂休息，避免设备过热
+            # time.sleep(3)
+            
+        except Exception as e:
+            logger.error(f"❌ 执行查询时出错: {e}")
+            
+            # 记录失败结果
+            success = False
+            result = {
+                'query': query,
+                'type': query_type,
+                'row': row_num,
+                'success': False,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        # 统计和结果记录在锁内完成，并发执行时保持一致
+        with self._state_lock:
+            if success:
+                self.success_count += 1
+            else:
+                self._record_failure(query_info)
+            self.total_count += 1
+            
+            execution_results.append(result)
+            progress_fp.write(dumps_json_line(result))
+            progress_fp.flush()
+    
+    def _run_queries_concurrently(self, pending, total, executors, progress_fp, execution_results):
+        """多台设备并发执行查询，同时执行的查询数不超过设备数"""
+        logger.info(f"⚡ 使用 {len(executors)} 台设备并发执行 {len(pending)} 个查询")
+        
+        # 空闲的任务执行器，执行查询前领取一个，完成后归还
+        idle_executors = queue.Queue()
+        for executor in executors:
+            idle_executors.put(executor)
+        
+        def run(i, query_info, target_output):
+            executor = idle_executors.get()
+            try:
+                self._run_query(i, total, query_info, target_output, executor, progress_fp, execution_results)
+            finally:
+                idle_executors.put(executor)
+        
+        with ThreadPoolExecutor(max_workers=len(executors), thread_name_prefix="batch_query") as pool:
+            futures = [pool.submit(run, *args) for args in pending]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                # 取消尚未开始的查询，并中断正在执行的任务
+                for future in futures:
+                    future.cancel()
+                for executor in executors:
+                    executor.interrupt_task()
+                raise
+    
+    def _get_device_executors(self):
+        """多台设备时为每台设备创建任务执行器（只创建一次），单台设备时返回空列表"""
+        if len(self.device_ids) <= 1:
+            return []
+        
+        if self._device_executors is None:
+            # 设备控制器按 config.device_id 连接设备，逐个切换后创建
+            original_device_id = config.device_id
+            executors = []
+            try:
+                for device_id in self.device_ids:
+                    config.device_id = device_id
+                    executors.append(TaskExecutor(
+                        output_base_dir=os.path.join(self.task_output_base_dir, device_id.replace(':', '_'))
+                    ))
+            finally:
+                config.device_id = original_device_id
+            self._device_executors = executors
+        
+        return self._device_executors
+    
+    def _close_executors(self):
+        """批量执行结束后释放任务执行器的后台线程"""
+        for executor in [self.executor] + (self._device_executors or []):
+            if executor is not None:
+                executor.close()
+    
+    def _record_failure(self, query_info):
+        """记录失败的查询：写入失败记录文件，未打开文件时暂存在内存中"""
+        self.failed_count += 1
+        if self._failed_fp is not None:
+            self._failed_fp.write(dumps_json_line(query_info))
+            self._failed_fp.flush()
+        else:
+            self.failed_queries.append(query_info)
+    
+    def _load_failed_queries(self):
+        """获取本次执行中所有失败的查询"""
+        if self._failed_fp is None:
+            return self.failed_queries
+        
+        self._failed_fp.flush()
+        return load_json_lines(self._failed_fp.name)
+    
+    def _load_completed_queries(self, progress_file):
+        """读取进度文件，返回之前已成功的查询 {(query, row): result}"""
+        if not os.path.exists(progress_file):
+            return {}
+        
+        completed = {}
+        for result in load_json_lines(progress_file):
+            key = (result.get('query'), result.get('row'))
+            # 同一查询可能被执行多次，以最后一次结果为准
+            if result.get('success'):
+                completed[key] = result
+            else:
+                completed.pop(key, None)
+        return completed
+    
+    @staticmethod
+    def _has_success_marker(target_output, query):
+        """输出目录中是否有该查询的成功标记（目录名只取查询前30个字符，需核对标记中的完整查询）"""
+        try:
+            with open(os.path.join(target_output, _SUCCESS_MARKER), "r", encoding="utf-8") as f:
+                return f.read() == query
+        except OSError:
+            return False
+    
+    def _replace_output(self, original_output, target_output, success, query):
+        """将任务输出目录移动到目标目录，耗时的移动和清理在后台线程中进行"""
+        # 先在原位置重命名（同目录内为原子操作），腾出任务执行器的输出路径，
+        # 下一个任务可以立即开始，不会与后台移动冲突
+        if not original_output:
+            return
+        staging_dir = f"{original_output}.moving-{uuid.uuid4().hex[:8]}"
+        try:
+            os.replace(original_output, staging_dir)
+        except FileNotFoundError:
+            # 任务没有产生输出目录（如设备连接失败），无需移动
+            return
+        except OSError:
+            # 无法重命名（如目录被占用）时同步完成移动
+            self._finalize_output(original_output, target_output, success, query)
+            return
+        
+        self._io_futures.append(self._io_pool.submit(self._finalize_output, staging_dir, target_output, success, query))
+    
+    def _finalize_output(self, source_dir, target_output, success, query):
+        """用输出目录替换目标目录（同一文件系统内为原子重命名），成功时写入完成标记"""
+        with self._output_locks_guard:
+            lock = self._output_locks.setdefault(target_output, threading.Lock())
+        
+        with lock:
+            # 如果目标目录存在，先重命名让出位置，最后再删除（直接尝试重命名，省去存在性检查）
+            trash_dir = f"{target_output}.trash-{uuid.uuid4().hex[:8]}"
+            try:
+                os.replace(target_output, trash_dir)
+            except FileNotFoundError:
+                trash_dir = None
+            
+            try:
+                os.replace(source_dir, target_output)
+            except OSError:
+                # 跨文件系统无法直接重命名，退回复制+删除
+                shutil.move(source_dir, target_output)
+            
+            # 标记该查询已成功完成（写入完整查询，区分前30个字符相同、共用目录的不同查询）
+            if success:
+                with open(os.path.join(target_output, _SUCCESS_MARKER), "w", encoding="utf-8") as f:
+                    f.write(query)
+        
+        logger.info(f"📁 输出已保存到: {target_output}")
+        if trash_dir:
+            shutil.rmtree(trash_dir, ignore_errors=True)
+    
+    def _wait_pending_io(self):
+        """等待后台输出整理任务完成，并记录失败的任务"""
+        futures, self._io_futures = self._io_futures, []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"❌ 整理任务输出失败: {e}")
+    
     def _save_execution_results(self, results, sheet_name, output_dir):
         """保存执行结果"""
         results_file = os.path.join(output_dir, f"{sheet_name}_execution_results.json")
         
-        with open(results_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        results_file = dump_json(results, results_file, compress=self.compress)
         
         logger.info(f"📄 执行结果已保存: {results_file}")
     
     def _extract_launched_apps(self, task_data: dict, launched_apps: set):
         """从任务数据中提取启动的应用"""
-        if not task_data or "data" not in task_data:
+        steps = task_data.get("data") if task_data else None
+        if not steps:
             return
         
-        for step_data in task_data["data"]:
-            if "plan" in step_data:
-                plans = step_data["plan"]
-                if isinstance(plans, list):
-                    for plan in plans:
-                        if isinstance(plan, dict):
-                            # 检查是否是Open操作
-                            if plan.get("type", "").lower() == "open":
-                                # 提取应用包名
-                                if "package" in plan and plan["package"]:
-                                    launched_apps.add(plan["package"])
-                                    logger.info(f"📱 记录启动应用: {plan['package']}")
-                                # 如果没有包名，尝试从配置中获取
-                                elif "app" in plan and plan["app"]:
-                                    app_name = plan["app"]
-                                    from src.config import config
-                                    if app_name in config.app_packages:
-                                        package_name = config.app_packages[app_name]
-                                        launched_apps.add(package_name)
-                                        logger.info(f"📱 记录启动应用: {package_name} (来自{app_name})")
+        # 循环外绑定常用对象，减少循环内的属性查找
+        app_packages = config.app_packages
+        add_app = launched_apps.add
+        
+        for step_data in steps:
+            plans = step_data.get("plan")
+            if not isinstance(plans, list):
+                continue
+            
+            for plan in plans:
+                if not isinstance(plan, dict):
+                    continue
+                
+                # 检查是否是Open操作
+                action_type = plan.get("type")
+                if not isinstance(action_type, str) or action_type.lower() != "open":
+                    continue
+                
+                # 提取应用包名
+                package_name = plan.get("package")
+                if package_name:
+                    add_app(package_name)
+                    logger.info(f"📱 记录启动应用: {package_name}")
+                    continue
+                
+                # 如果没有包名，尝试从配置中获取
+                app_name = plan.get("app")
+                if app_name and app_name in app_packages:
+                    package_name = app_packages[app_name]
+                    add_app(package_name)
+                    logger.info(f"📱 记录启动应用: {package_name} (来自{app_name})")
     
     def _generate_report(self):
         """生成执行报告"""
-        total_time = time.time() - self.start_time if self.start_time else 0
+        total_time = time.perf_counter() - self.start_time if self.start_time else 0
         
         logger.info(f"\n" + "=" * 60)
         logger.info("📊 批量执行报告")
         logger.info("=" * 60)
         logger.info(f"✅ 成功: {self.success_count}")
-        logger.info(f"❌ 失败: {len(self.failed_queries)}")
+        logger.info(f"❌ 失败: {self.failed_count}")
         logger.info(f"📈 总计: {self.total_count}")
         logger.info(f"📊 成功率: {(self.success_count/self.total_count*100):.1f}%" if self.total_count > 0 else "0%")
         logger.info(f"⏰ 总用时: {total_time/60:.1f} 分钟")
         logger.info(f"⚡ 平均每个查询: {total_time/self.total_count:.1f} 秒" if self.total_count > 0 else "0 秒")
         
-        if self.failed_queries:
+        failed_queries = self._load_failed_queries() if self.failed_count else []
+        if failed_queries:
             logger.info(f"\n❌ 失败的查询:")
-            for i, query_info in enumerate(self.failed_queries, 1):
+            for i, query_info in enumerate(failed_queries, 1):
                 logger.info(f"  {i}. {query_info['query']} (类型: {query_info['type']})")
         
         # 保存报告
@@ -297,20 +744,19 @@ class BatchExecutor:
             'summary': {
                 'total': self.total_count,
                 'success': self.success_count,
-                'failed': len(self.failed_queries),
+                'failed': self.failed_count,
                 'success_rate': (self.success_count/self.total_count*100) if self.total_count > 0 else 0
             },
-            'failed_queries': self.failed_queries,
+            'failed_queries': failed_queries,
             'timestamp': datetime.now().isoformat()
         }
         
         report_file = os.path.join(self.output_base_dir, "batch_execution_report.json")
-        with open(report_file, "w", encoding="utf-8") as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        report_file = dump_json(report, report_file, compress=self.compress)
         
         logger.info(f"\n📄 详细报告已保存: {report_file}")
 
-def main(task_output_base_dir="output"):
+def main(task_output_base_dir="output", resume=False, device_ids=None, compress=False):
     """主函数"""
     try:
         logger.info("🤖 批量任务执行器启动")
@@ -328,6 +774,9 @@ def main(task_output_base_dir="output"):
         choice = input("\n请选择 (1/2/3): ").strip()
         
         batch_executor = BatchExecutor(task_output_base_dir=task_output_base_dir)
+        batch_executor.resume = resume
+        batch_executor.device_ids = device_ids or []
+        batch_executor.compress = compress
         
         if choice == "2":
             # 让用户选择sheets
@@ -358,6 +807,12 @@ def main(task_output_base_dir="output"):
         logger.info(f"   目标sheets: {batch_executor.target_sheets}")
         logger.info(f"   处理列: '示例query'")
         logger.info(f"   输出目录: {batch_executor.output_base_dir}")
+        if resume:
+            logger.info(f"   续跑模式: 跳过已成功的查询")
+        if len(batch_executor.device_ids) > 1:
+            logger.info(f"   并行设备: {batch_executor.device_ids}")
+        if compress:
+            logger.info(f"   压缩保存: 结果和报告以zstd压缩保存")
         
         confirm = input("\n是否开始执行？(y/N): ").strip().lower()
         if confirm in ['n', 'no', '否']:
@@ -377,11 +832,18 @@ def main(task_output_base_dir="output"):
         logger.error(f"\n❌ 批量执行出错: {e}")
 
 if __name__ == "__main__":
-    # 支持命令行参数指定单个任务的输出基础目录
-    import sys
+    # 支持命令行参数指定单个任务的输出基础目录，--resume 跳过已成功的查询，
+    # --devices=设备1,设备2 使用多台设备按sheet并行执行，--compress 以zstd压缩保存结果
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    resume = "--resume" in sys.argv[1:]
+    compress = "--compress" in sys.argv[1:]
+    device_ids = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--devices="):
+            device_ids = [d.strip() for d in arg[len("--devices="):].split(",") if d.strip()]
     task_output_dir = "output"
-    if len(sys.argv) > 1:
-        task_output_dir = sys.argv[1]
+    if args:
+        task_output_dir = args[0]
         logger.info(f"📁 使用命令行指定的任务输出目录: {task_output_dir}")
     
-    main(task_output_base_dir=task_output_dir) 
\ No newline at end of file
+    main(task_output_base_dir=task_output_dir, resume=resume, device_ids=device_ids, compress=compress) 
\ No newline at end of file
@@ -14,8 +14,14 @@ from src.logger_config import get_logger
 
 logger = get_logger(__name__)
 
-def main(output_base_dir="output"):
-    """主函数"""
+def _ask(prompt, default=""):
+    """读取用户输入；标准输入不是终端（如脚本、CI中运行）时不等待输入，直接返回默认值"""
+    if not sys.stdin.isatty():
+        return default
+    return input(prompt).strip()
+
+def main(output_base_dir="output", query=None, assume_yes=False):
+    """主函数（query为空时交互输入任务，assume_yes为True时不再询问输出目录和确认执行）"""
     logger.info("=" * 60)
     logger.info("🤖 手机UI自动化任务执行器")
     logger.info("=" * 60)
@@ -27,20 +33,21 @@ def main(output_base_dir="output"):
     os.makedirs("output_样例", exist_ok=True)
     os.makedirs(output_base_dir, exist_ok=True)
     
-    # 获取用户输入的任务
-    logger.info("\n请输入您要执行的任务:")
-    logger.info("示例: 在京东上查快递")
-    logger.info("示例: 打开淘宝搜索手机")
-    logger.info("示例: 进入微信发朋友圈")
-    
-    query = input("\n👤 任务描述: ").strip()
+    # 获取用户输入的任务（命令行已通过--query指定时跳过）
     if not query:
-        logger.error("❌ 任务描述不能为空")
+        logger.info("\n请输入您要执行的任务:")
+        logger.info("示例: 在京东上查快递")
+        logger.info("示例: 打开淘宝搜索手机")
+        logger.info("示例: 进入微信发朋友圈")
+        
+        query = _ask("\n👤 任务描述: ")
+    if not query:
+        logger.error("❌ 任务描述不能为空（非交互运行时请使用 --query=任务描述 指定）")
         return False
     
     # 询问输出目录（可选）
-    if output_base_dir == "output":
-        custom_output = input(f"\n📁 输出目录 (默认: {output_base_dir}): ").strip()
+    if output_base_dir == "output" and not assume_yes:
+        custom_output = _ask(f"\n📁 输出目录 (默认: {output_base_dir}): ")
         if custom_output:
             output_base_dir = custom_output
             os.makedirs(output_base_dir, exist_ok=True)
@@ -49,7 +56,7 @@ def main(output_base_dir="output"):
     logger.info(f"📁 输出目录: {os.path.abspath(output_base_dir)}")
     
     # 确认执行
-    confirm = input("是否开始执行？(Y/n): ").strip().lower()
+    confirm = "" if assume_yes else _ask("是否开始执行？(Y/n): ").lower()
     if confirm and confirm in ['n', 'no', '否']:
         logger.info("❌ 任务已取消")
         return False
@@ -79,19 +86,30 @@ def main(output_base_dir="output"):
         logger.info("🧹 正在清理应用...")
         executor.device.clean_apps()
         return False
+    finally:
+        executor.close()
 
 if __name__ == "__main__":
-    # 支持命令行参数指定输出目录
+    # 支持命令行参数指定输出目录，--query=任务描述 直接执行指定任务，--yes 跳过确认
+    # （指定--query或标准输入不是终端时只执行一次，便于脚本和性能测试中无人值守运行）
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    assume_yes = "--yes" in sys.argv[1:]
+    query = None
+    for arg in sys.argv[1:]:
+        if arg.startswith("--query="):
+            query = arg[len("--query="):].strip()
     output_dir = "output"
-    if len(sys.argv) > 1:
-        output_dir = sys.argv[1]
+    if args:
+        output_dir = args[0]
         logger.info(f"📁 使用命令行指定的输出目录: {output_dir}")
     
     while True:
-        success = main(output_base_dir=output_dir)
+        success = main(output_base_dir=output_dir, query=query, assume_yes=assume_yes)
+        if query or not sys.stdin.isatty():
+            break
         
         # 询问用户是否继续
-        continue_choice = input("\n是否继续执行新任务？(y/N): ").strip().lower()
+        continue_choice = _ask("\n是否继续执行新任务？(y/N): ").lower()
         if continue_choice in ['n', 'no', '否']:
             logger.info("👋 程序已退出")
             break
@@ -6,16 +6,72 @@ AI分析模块
 负责分析界面状态并提供操作建议
 """
 
+import base64
+import hashlib
+import io
 import json
+import random
 import re
 import os
-from dashscope import Generation
-from dashscope import MultiModalConversation
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from PIL import Image
 from .config import config
+from .json_utils import loads_json
+from .llm_cache import LLMCache
 from .logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# 从任意位置开始解码JSON对象的解码器
+_JSON_DECODER = json.JSONDecoder()
+
+# markdown代码块标记（```json 或 ```）及其后的空白
+_FENCE_RE = re.compile(r'```(?:json)?\s*')
+
+# 顶层分析结果必须包含的字段之一（用于区分外层对象与其内部嵌套的plan等对象）
+_TOP_LEVEL_KEYS = ("observation", "plan")
+
+# QwenVL提取结果缓存的最大条目数
+_VL_CACHE_SIZE = 64
+
+# XML标签之间的空白（缩进、换行）和值为空的属性（text=""、content-desc=""等）
+_XML_BLANK_RE = re.compile(r'>\s+<')
+_XML_EMPTY_ATTR_RE = re.compile(r'\s[\w:.-]+=""')
+
+
+def _minify_xml(xml_content: str) -> str:
+    """精简XML：去掉标签间空白和空属性，减少模型输入token，不改变节点及有效属性"""
+    xml_content = _XML_BLANK_RE.sub('><', xml_content)
+    return _XML_EMPTY_ATTR_RE.sub('', xml_content).strip()
+
+
+@lru_cache(maxsize=8)
+def _encode_screenshot(abs_path: str, mtime_ns: int, file_size: int, max_side: int) -> str:
+    """将截图缩小到最长边不超过max_side并编码为JPEG data URI（以路径、修改时间和大小为缓存键）"""
+    with Image.open(abs_path) as image:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        # 视觉token数随分辨率平方增长，缩小后模型输入显著减少
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class ModelCallError(RuntimeError):
+    """模型调用返回了错误状态码"""
+    
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(f"HTTP {status_code} {code}: {message}")
+        self.status_code = status_code
+        # 限流和服务端错误可以重试；鉴权失败、参数错误等其他4xx错误重试也不会成功
+        self.retryable = status_code == 429 or status_code >= 500
+
+
 class AIAnalyzer:
     """AI分析器"""
     
@@ -25,57 +81,179 @@ class AIAnalyzer:
         
         # 显示当前模型配置
         config.print_model_config()
+        
+        # AI响应缓存（可选）
+        self.response_cache = None
+        if config.llm_cache.get("enabled", False):
+            self.response_cache = LLMCache(
+                db_path=config.llm_cache.get("path"),
+                max_entries=config.llm_cache.get("max_entries", 256),
+                ttl=config.llm_cache.get("ttl")
+            )
+            logger.info("⚡ AI响应缓存已启用")
+        
+        # 多模态文本提取在后台线程中执行，与本地处理重叠
+        self._vl_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qwenvl")
+        
+        # QwenVL提取结果缓存：截图内容摘要 -> 提取的文本（界面未变化时跳过多模态调用）
+        self._vl_cache = OrderedDict()
+        self._vl_cache_lock = threading.Lock()
     
-    def analyze_screen(self, xml_path: str, query: str, current_step: int = 1, screenshot_path: str = None, history_steps: list = None) -> dict:
-        """分析当前屏幕状态并提供操作建议"""
+    def analyze_screen(self, xml_path: str, query: str, current_step: int = 1, screenshot_path: str = None, history_steps: list = None, xml_content: str = None) -> dict:
+        """分析当前屏幕状态并提供操作建议（调用方已有XML内容时可通过xml_content传入，不再读取xml_path）"""
+        has_screenshot = bool(screenshot_path) and os.path.exists(screenshot_path)
+        
+        # 多模态提取只依赖截图：未启用响应缓存时立即在后台发起，与读取XML、构建提示词重叠
+        # （启用缓存时需先判断界面是否命中缓存，命中则无需调用）
+        vl_future = None
+        if has_screenshot and self.response_cache is None:
+            vl_future = self._start_qwenvl_extraction(screenshot_path)
+        
         # 读取XML内容
-        with open(xml_path, "r", encoding="utf-8") as f:
-            xml_content = f.read()
+        if xml_content is None:
+            with open(xml_path, "r", encoding="utf-8") as f:
+                xml_content = f.read()
+        if config.minify_xml:
+            xml_content = _minify_xml(xml_content)
+        
+        system_prompt = config.get_ai_system_prompt()
+        call_params = self._model_call_params()
+        
+        # 同一任务、步骤、历史下界面（XML和截图）完全相同时，直接复用之前的结果，
+        # 连同多模态增强调用一起跳过
+        screen_key = None
+        if self.response_cache is not None:
+            screen_key = LLMCache.make_key(
+                "screen", config.model_name, call_params, system_prompt,
+                query, current_step, history_steps, xml_content,
+                self._file_digest(screenshot_path) if has_screenshot else None
+            )
+            cached = self.response_cache.get(screen_key)
+            if cached is not None:
+                logger.info("⚡ 界面未变化，命中AI响应缓存，跳过多模态增强和模型调用")
+                return self._parse_response(cached)
         
         # 如果提供了截图，使用多模态增强
         enhanced_content = xml_content
-        if screenshot_path and os.path.exists(screenshot_path):
+        if has_screenshot:
+            if vl_future is None:
+                vl_future = self._start_qwenvl_extraction(screenshot_path)
             try:
-                enhanced_content = self._enhance_with_qwenvl_html(xml_content, screenshot_path)
+                enhanced_content = self._enhance_with_qwenvl_html(xml_content, vl_future)
             except Exception as e:
                 logger.warning(f"多模态增强失败，使用原始XML: {e}")
         
         # 构建提示词
         user_prompt = self._build_prompt(query, enhanced_content, current_step, history_steps)
         
+        # 相同的模型、参数和提示词直接使用缓存的响应
+        result = None
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = LLMCache.make_key(config.model_name, call_params, system_prompt, user_prompt)
+            result = self.response_cache.get(cache_key)
+            if result is not None:
+                logger.info("⚡ 命中AI响应缓存，跳过模型调用")
+        from_cache = result is not None
+        
         # 调用AI模型，添加稳定输出参数
+        # dashscope在首次调用模型时才导入，启动程序、输入任务时无需等待SDK加载
+        from dashscope import Generation
         max_retries = 3
         retry_count = 0
         
-        while retry_count < max_retries:
+        while result is None and retry_count < max_retries:
             try:
                 # logger.info(f"模型输入: {user_prompt}")
                 response = Generation.call(
                     api_key=config.dashscope_api_key,
                     model=config.model_name,
                     messages=[
-                        {"role": "system", "content": config.get_ai_system_prompt()},
+                        self._build_system_message(system_prompt),
                         {"role": "user", "content": user_prompt}
                     ],
                     # 使用配置文件中的稳定输出参数
-                    **config.model_params
+                    **call_params
                 )
                 
-                if config.model_name in ['qwen-max', 'qwen-plus']:
+                # DashScope对HTTP错误不抛异常，而是返回带状态码的响应
+                status_code = getattr(response, "status_code", 200)
+                if status_code != 200:
+                    raise ModelCallError(status_code, getattr(response, "code", ""), getattr(response, "message", ""))
+                
+                if config.model_name in ['qwen-max', 'qwen-plus'] and call_params.get("result_format") != "message":
                     result = response.output.text
                 else:
                     result = response.output.choices[0].message.content
                 logger.info(f"🤖 AI原始响应长度: {len(result)} 字符")
+                self._log_cached_tokens(response)
                 break
             except Exception as e:
                 retry_count += 1
+                if isinstance(e, ModelCallError) and not e.retryable:
+                    logger.error(f"AI调用失败，错误不可重试: {str(e)}")
+                    raise
                 logger.warning(f"AI调用失败 (尝试 {retry_count}/{max_retries}): {str(e)}")
                 if retry_count >= max_retries:
                     logger.error(f"AI调用失败，已达到最大重试次数: {str(e)}")
                     raise
+                # 指数退避并加入随机抖动，避免限流时密集重试
+                time.sleep(min(8, 0.5 * 2 ** retry_count) + random.random() * 0.25)
         
         # 解析AI响应（如果失败会直接抛出异常）
-        return self._parse_response(result)
+        ai_result = self._parse_response(result)
+        
+        # 只缓存能成功解析的响应
+        if cache_key is not None:
+            if not from_cache:
+                self.response_cache.set(cache_key, result)
+            self.response_cache.set(screen_key, result)
+        
+        return ai_result
+    
+    def close(self):
+        """释放后台QwenVL提取线程（不等待正在进行的模型调用）"""
+        self._vl_pool.shutdown(wait=False)
+    
+    @staticmethod
+    def _file_digest(path: str) -> str:
+        """计算文件内容摘要（用于截图是否变化的判断）"""
+        with open(path, "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    
+    def _model_call_params(self) -> dict:
+        """模型调用参数：配置中的稳定输出参数，开启JSON输出模式时要求模型直接返回JSON对象"""
+        if not config.json_response_format:
+            return config.model_params
+        
+        # JSON模式只支持message格式的返回结果
+        return {
+            **config.model_params,
+            "result_format": "message",
+            "response_format": {"type": "json_object"}
+        }
+    
+    def _build_system_message(self, system_prompt: str) -> dict:
+        """构建系统消息，系统提示词每步不变，作为消息前缀供服务端上下文缓存复用"""
+        if not config.explicit_prompt_cache:
+            return {"role": "system", "content": system_prompt}
+        
+        # 显式缓存：标记缓存位置，后续请求命中时不再重复计算系统提示词
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        }
+    
+    def _log_cached_tokens(self, response):
+        """记录上下文缓存命中的输入token数"""
+        try:
+            usage = response.usage or {}
+            cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        except (AttributeError, TypeError):
+            return
+        
+        if cached_tokens:
+            logger.info(f"⚡ 上下文缓存命中: {cached_tokens}/{usage.get('input_tokens', '?')} 个输入token")
     
     def _build_prompt(self, query: str, xml_content: str, current_step: int, history_steps: list = None) -> str:
         """构建AI提示词"""
@@ -86,8 +264,8 @@ class AIAnalyzer:
         # 清理响应文本
         cleaned_response = self._clean_response(response)
         
-        # 提取第一个完整的JSON对象
-        json_obj = self._extract_first_valid_json(cleaned_response)
+        # 提取第一个完整的JSON对象（响应中没有'{'时不可能包含JSON对象，无需尝试解析）
+        json_obj = self._extract_first_valid_json(cleaned_response) if '{' in cleaned_response else None
         
         if json_obj:
             # 验证和修复必要字段
@@ -98,9 +276,9 @@ class AIAnalyzer:
     
     def _clean_response(self, response: str) -> str:
         """清理AI响应文本"""
-        # 移除markdown代码块标记
-        response = re.sub(r'```json\s*', '', response)
-        response = re.sub(r'```\s*', '', response)
+        # 移除markdown代码块标记（一次替换完成，不含代码块标记时直接跳过）
+        if '```' in response:
+            response = _FENCE_RE.sub('', response)
         
         # 移除多余的空白字符
         response = response.strip()
@@ -108,82 +286,37 @@ class AIAnalyzer:
         return response
     
     def _extract_first_valid_json(self, text: str) -> dict:
-        """提取第一个有效的JSON对象"""
-        # 尝试多种JSON提取策略
-        strategies = [
-            # 策略1: 查找第一个完整的JSON对象
-            self._find_complete_json_object,
-            # 策略2: 使用正则表达式提取
-            self._regex_extract_json,
-            # 策略3: 逐行解析
-            self._line_by_line_parse
-        ]
+        """提取第一个有效的顶层JSON对象：依次从每个'{'处直接解码（C实现，字符串内的括号不影响解析）
         
-        for i, strategy in enumerate(strategies, 1):
+        只接受包含observation或plan字段的对象，外层对象不完整时不会误取其内部嵌套的对象，
+        而是返回None交由重试/报错流程处理
+        """
+        # 常见情况：清理后的响应本身就是一个JSON对象，整体解析（有orjson时更快）
+        if text.startswith('{'):
             try:
-                result = strategy(text)
-                if result and isinstance(result, dict):
-                    logger.debug(f"✅ JSON解析成功，使用策略{i}")
-                    return result
-            except Exception as e:
-                logger.warning(f"⚠️  策略{i}解析失败: {e}")
-                continue
-        
-        # 所有策略都失败，返回None
-        return None
-    
-    def _find_complete_json_object(self, text: str) -> dict:
-        """查找第一个完整的JSON对象"""
-        brace_count = 0
-        start_idx = -1
+                json_obj = loads_json(text)
+                if self._is_top_level_object(json_obj):
+                    return json_obj
+            except ValueError:
+                pass
         
-        for i, char in enumerate(text):
-            if char == '{':
-                if start_idx == -1:
-                    start_idx = i
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0 and start_idx != -1:
-                    # 找到完整的JSON对象
-                    json_str = text[start_idx:i+1]
-                    return json.loads(json_str)
+        start = text.find('{')
+        while start != -1:
+            try:
+                json_obj, _ = _JSON_DECODER.raw_decode(text, start)
+                if self._is_top_level_object(json_obj):
+                    return json_obj
+            except ValueError:
+                pass
+            start = text.find('{', start + 1)
         
+        # 没有可解析的JSON对象，返回None
         return None
     
-    def _regex_extract_json(self, text: str) -> dict:
-        """使用正则表达式提取JSON"""
-        # 查找第一个JSON对象
-        json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
-            return json.loads(json_str)
-        return None
-    
-    def _line_by_line_parse(self, text: str) -> dict:
-        """逐行解析，适用于格式化的JSON"""
-        lines = text.split('\n')
-        json_lines = []
-        in_json = False
-        brace_count = 0
-        
-        for line in lines:
-            stripped = line.strip()
-            if stripped.startswith('{'):
-                in_json = True
-                brace_count += stripped.count('{') - stripped.count('}')
-                json_lines.append(line)
-            elif in_json:
-                brace_count += stripped.count('{') - stripped.count('}')
-                json_lines.append(line)
-                if brace_count <= 0:
-                    break
-        
-        if json_lines:
-            json_str = '\n'.join(json_lines)
-            return json.loads(json_str)
-        
-        return None
+    @staticmethod
+    def _is_top_level_object(json_obj) -> bool:
+        """判断解码结果是否为顶层分析结果对象"""
+        return isinstance(json_obj, dict) and any(key in json_obj for key in _TOP_LEVEL_KEYS)
     
     def _validate_and_fix_response(self, json_obj: dict) -> dict:
         """验证和修复AI响应"""
@@ -191,25 +324,18 @@ class AIAnalyzer:
         if not isinstance(json_obj.get("observation"), str):
             json_obj["observation"] = "AI分析结果"
         
-        if "is_task_completed" not in json_obj:
-            json_obj["is_task_completed"] = False
+        json_obj.setdefault("is_task_completed", False)
+        json_obj.setdefault("completion_reason", "")
         
-        if "completion_reason" not in json_obj:
-            json_obj["completion_reason"] = ""
-        
-        if "plan" not in json_obj or not isinstance(json_obj["plan"], dict):
+        plan = json_obj.get("plan")
+        if not isinstance(plan, dict):
             json_obj["plan"] = self._get_default_plan()
         else:
-            # 修复plan字段
-            plan = json_obj["plan"]
-            if "description" not in plan:
-                plan["description"] = "继续操作"
-            if "type" not in plan:
-                plan["type"] = "Manual"
-            if "position" not in plan:
-                plan["position"] = [540, 1200]
-            if "box" not in plan:
-                plan["box"] = [[515, 1180], [565, 1220]]
+            # 修复plan字段（每个字段只查找一次）
+            plan.setdefault("description", "继续操作")
+            plan.setdefault("type", "Manual")
+            plan.setdefault("position", [540, 1200])
+            plan.setdefault("box", [[515, 1180], [565, 1220]])
         
         logger.info(f"✅ AI分析成功: {json_obj['observation']}")
         return json_obj
@@ -223,13 +349,20 @@ class AIAnalyzer:
             "box": [[515, 1180], [565, 1220]]
         }
     
-    def _enhance_with_qwenvl_html(self, xml_content: str, screenshot_path: str) -> str:
-        """使用QwenVL HTML提取文本信息并增强XML"""
+    def _start_qwenvl_extraction(self, screenshot_path: str):
+        """在后台发起QwenVL截图文本提取，返回Future"""
+        logger.info("🖼️ 开始使用QwenVL 提取截图文本...")
+        return self._vl_pool.submit(self._extract_text_with_qwenvl_html, screenshot_path)
+    
+    def _enhance_with_qwenvl_html(self, xml_content: str, vl_future) -> str:
+        """等待QwenVL HTML提取结果并增强XML，超时则使用原始XML"""
         try:
-            logger.info("🖼️ 开始使用QwenVL 提取截图文本...")
-            
-            # 1. 使用QwenVL HTML提取截图中的文本信息
-            html_content = self._extract_text_with_qwenvl_html(screenshot_path)
+            # 1. 等待QwenVL HTML提取截图中的文本信息（超过config.multimodal_timeout秒不再等待）
+            try:
+                html_content = vl_future.result(timeout=config.multimodal_timeout)
+            except FutureTimeoutError:
+                logger.warning(f"⏱️ QwenVL提取超过{config.multimodal_timeout}秒，使用原始XML")
+                return xml_content
             
             if not html_content:
                 logger.warning("QwenVL HTML提取失败，使用原始XML")
@@ -253,8 +386,23 @@ class AIAnalyzer:
     def _extract_text_with_qwenvl_html(self, screenshot_path: str) -> str:
         """使用QwenVL HTML提取截图中的文本信息"""
         try:
-            # 构建多模态请求
-            image_path = f"file://{os.path.abspath(screenshot_path)}"
+            # 截图内容与之前某次完全相同时直接复用提取结果
+            digest = self._file_digest(screenshot_path)
+            with self._vl_cache_lock:
+                cached = self._vl_cache.get(digest)
+                if cached is not None:
+                    self._vl_cache.move_to_end(digest)
+            if cached is not None:
+                logger.info("⚡ 截图未变化，复用QwenVL提取结果")
+                return cached
+            
+            # 构建多模态请求（截图缩小后以内存中的base64传入，不再由SDK读取并上传原图）
+            abs_path = os.path.abspath(screenshot_path)
+            if config.multimodal_max_side:
+                stat = os.stat(abs_path)
+                image_path = _encode_screenshot(abs_path, stat.st_mtime_ns, stat.st_size, config.multimodal_max_side)
+            else:
+                image_path = f"file://{abs_path}"
             
             messages = [
                 {
@@ -270,7 +418,8 @@ class AIAnalyzer:
                 }
             ]
             
-            # 调用多模态模型
+            # 调用多模态模型（首次使用时才导入）
+            from dashscope import MultiModalConversation
             response = MultiModalConversation.call(
                 api_key=config.dashscope_api_key,
                 model='qwen-vl-max-latest',
@@ -292,6 +441,11 @@ class AIAnalyzer:
                 html_content = result
             
             # logger.info(f"🤖 QwenVL HTML提取完成，响应: {html_content}")
+            if html_content:
+                with self._vl_cache_lock:
+                    self._vl_cache[digest] = html_content
+                    while len(self._vl_cache) > _VL_CACHE_SIZE:
+                        self._vl_cache.popitem(last=False)
             return html_content
             
         except Exception as e:
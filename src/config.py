@@ -10,97 +10,13 @@ from .logger_config import get_logger
 
 logger = get_logger(__name__)
 
-class Config:
-    """配置管理类"""
-    
-    def __init__(self):
-        # API配置
-        self.dashscope_api_key = os.getenv("DASHSCOPE_API_KEY")
-        
-        # 模型配置  qwen-max、deepseek-r1、qwen-plus
-        self.model_name = "deepseek-r1"  # 默认模型
-        
-        # 模型参数配置
-        self.model_params = {
-            "temperature": 0.0,
-            "stream": False,
-            "top_p": 0.8,
-            "top_k": 50,
-            "enable_thinking": False
-        }
-        
-        # 设备配置
-        self.device_id = "auto"  # 自动检测设备
-        
-        # 默认屏幕分辨率
-        self.default_screen_resolution = [1080, 2400]
-        
-        # 应用包名映射
-        self.app_packages = {
-            "美团外卖": "com.sankuai.meituan.takeoutnew", 
-            "饿了么": "me.ele",
-            "爱奇艺": "com.qiyi.video",
-            "懂车帝": "com.ss.android.auto",
-            "滴滴出行": "com.sdu.didi.psnger",
-            "携程": "ctrip.android.view"
-        }
-        
-        #最大执行次数
-        self.max_execution_times = 50
-        
-        # 隐私保护配置
-        self.privacy_protection = {
-            "enabled": True,  # 是否启用隐私保护
-            "auto_detect": True,  # 是否自动检测隐私敏感信息
-            "phone_anonymization": True,  # 是否启用手机号假名化
-            "debug_mode": False,  # 隐私处理调试模式
-            "temp_file_cleanup": True,  # 是否自动清理临时文件
-            "protection_keywords": [  # 隐私敏感关键词
-                '手机号', '电话', '联系方式', '个人信息', 
-                '隐私', '填写', '注册', '登录', '验证',
-                '联系人', '通讯录', '短信', '验证码'
-            ]
-        }
-        
-        # 验证配置
-        self._validate_config()
-    
-    def _validate_config(self):
-        """验证配置是否完整"""
-        if not self.dashscope_api_key:
-            logger.warning("DASHSCOPE_API_KEY 环境变量未设置")
-            logger.info("请设置环境变量: set DASHSCOPE_API_KEY=your_api_key")
-        else:
-            logger.info("DashScope API密钥已配置")
-    
-    def print_model_config(self):
-        """打印当前模型配置"""
-        logger.info("🤖 大模型配置:")
-        logger.info(f"   模型名称: {self.model_name}")
-        logger.info("   参数配置:")
-        for key, value in self.model_params.items():
-            logger.info(f"     {key}: {value}")
-    
-    def get_app_package(self, app_name: str) -> str:
-        """获取应用包名"""
-        package = self.app_packages.get(app_name)
-        if package:
-            logger.debug(f"找到应用包名: {app_name} -> {package}")
-        else:
-            logger.warning(f"未找到应用包名: {app_name}")
-        return package
-    
-    def update_screen_resolution(self, width: int, height: int):
-        """更新屏幕分辨率"""
-        self.default_screen_resolution = [width, height]
-        logger.info(f"屏幕分辨率已更新: {width}x{height}")
-    
-    def get_ai_system_prompt(self) -> str:
-        """获取AI系统提示词"""
-        # 生成应用包名列表文本
-        app_packages_text = "\n".join([f"- {app}: {package}" for app, package in self.app_packages.items()])
-        
-        return f"""你是一个专业的手机UI自动化助手。请根据XML界面结构信息和用户的操作指令，提供精确的操作信息：
+# 分析提示词中每步不变的片段，导入时构建一次
+_HISTORY_HEADER = "\n=== 执行历史 ===\n"
+_HISTORY_FOOTER = "\n根据以上执行历史，请分析当前界面状态并决定下一步操作。如果上一步执行完任务了，请判断了任务完成。\n"
+_ANALYSIS_PROMPT_TAIL = "\n请以上信息并告诉我下一步应该如何操作。请只返回一个JSON格式的响应，不要包含其他文本。"
+
+# AI系统提示词模板，唯一的占位符为{app_packages_text}（应用包名列表），JSON示例中的花括号已转义
+_SYSTEM_PROMPT_TEMPLATE = """你是一个专业的手机UI自动化助手。请根据XML界面结构信息和用户的操作指令，提供精确的操作信息：
 
 1. observation: 描述当前界面状态，必须按照以下格式规范：
 
@@ -262,29 +178,182 @@ class Config:
         "duration": 0.5
     }}
 }}"""
+
+class Config:
+    """配置管理类"""
+    
+    def __init__(self):
+        # API配置
+        self.dashscope_api_key = os.getenv("DASHSCOPE_API_KEY")
+        
+        # 模型配置  qwen-max、deepseek-r1、qwen-plus
+        self.model_name = "deepseek-r1"  # 默认模型
+        
+        # 模型参数配置
+        self.model_params = {
+            "temperature": 0.0,
+            "stream": False,
+            "top_p": 0.8,
+            "top_k": 50,
+            "enable_thinking": False
+        }
+        
+        # 要求模型直接输出JSON对象（response_format=json_object，仅部分模型支持，如qwen-max、qwen-plus）
+        # 响应仍经过JSON提取与字段校验，模型不支持时关闭即可
+        self.json_response_format = False
+        
+        # 显式缓存系统提示词（DashScope上下文缓存cache_control，仅部分模型支持）
+        # 关闭时依赖服务端对相同前缀的隐式缓存
+        self.explicit_prompt_cache = False
+        
+        # 等待QwenVL截图文本提取的最长时间（秒），超时后不使用多模态增强；为None时一直等待
+        self.multimodal_timeout = 30
+        
+        # 发送给QwenVL前将截图缩小到的最长边像素，为0时发送原图
+        self.multimodal_max_side = 1280
+        
+        # 设备配置
+        self.device_id = "auto"  # 自动检测设备
+        
+        # 获取压缩的XML层次结构（省略不重要的布局节点，XML更小、模型输入更短）
+        self.xml_compressed = False
+        
+        # 发送给模型前精简XML（去掉缩进空白和空属性）
+        self.minify_xml = True
+        
+        # 默认屏幕分辨率
+        self.default_screen_resolution = [1080, 2400]
+        
+        # 应用包名映射（运行中修改请使用update_app_packages，以便重新生成系统提示词）
+        self.app_packages = {
+            "美团外卖": "com.sankuai.meituan.takeoutnew", 
+            "饿了么": "me.ele",
+            "爱奇艺": "com.qiyi.video",
+            "懂车帝": "com.ss.android.auto",
+            "滴滴出行": "com.sdu.didi.psnger",
+            "携程": "ctrip.android.view"
+        }
+        # 系统提示词中的应用包名列表文本，随映射更新
+        self._app_packages_text = self._format_app_packages()
+        
+        #最大执行次数
+        self.max_execution_times = 50
+        
+        # 提示词执行历史中每步界面观察保留的最大字符数，为0时不截断
+        self.history_observation_max_chars = 80
+        
+        # 隐私保护配置
+        self.privacy_protection = {
+            "enabled": True,  # 是否启用隐私保护
+            "auto_detect": True,  # 是否自动检测隐私敏感信息
+            "phone_anonymization": True,  # 是否启用手机号假名化
+            "debug_mode": False,  # 隐私处理调试模式
+            "temp_file_cleanup": True,  # 是否自动清理临时文件
+            "protection_keywords": [  # 隐私敏感关键词
+                '手机号', '电话', '联系方式', '个人信息', 
+                '隐私', '填写', '注册', '登录', '验证',
+                '联系人', '通讯录', '短信', '验证码'
+            ]
+        }
+        
+        # AI响应缓存配置（模型、参数和提示词完全相同时复用之前的响应，跳过模型调用）
+        self.llm_cache = {
+            "enabled": False,  # 是否启用响应缓存
+            "path": "cache/llm_cache.sqlite3",  # 持久化文件路径（为空时只缓存在内存中）
+            "max_entries": 256,  # 内存中保留的最近条目数
+            "ttl": 7 * 24 * 3600  # 缓存有效期（秒）
+        }
+        
+        # 系统提示词缓存（应用包名映射更新时清空）
+        self._system_prompt_cache = None
+        
+        # 验证配置
+        self._validate_config()
+    
+    def _validate_config(self):
+        """验证配置是否完整"""
+        if not self.dashscope_api_key:
+            logger.warning("DASHSCOPE_API_KEY 环境变量未设置")
+            logger.info("请设置环境变量: set DASHSCOPE_API_KEY=your_api_key")
+        else:
+            logger.info("DashScope API密钥已配置")
+    
+    def print_model_config(self):
+        """打印当前模型配置"""
+        logger.info("🤖 大模型配置:")
+        logger.info(f"   模型名称: {self.model_name}")
+        logger.info("   参数配置:")
+        for key, value in self.model_params.items():
+            logger.info(f"     {key}: {value}")
+    
+    def get_app_package(self, app_name: str) -> str:
+        """获取应用包名"""
+        package = self.app_packages.get(app_name)
+        if package:
+            logger.debug(f"找到应用包名: {app_name} -> {package}")
+        else:
+            logger.warning(f"未找到应用包名: {app_name}")
+        return package
+    
+    def update_screen_resolution(self, width: int, height: int):
+        """更新屏幕分辨率"""
+        self.default_screen_resolution = [width, height]
+        logger.info(f"屏幕分辨率已更新: {width}x{height}")
+    
+    def update_app_packages(self, app_packages: dict):
+        """更新应用包名映射"""
+        self.app_packages.update(app_packages)
+        self._app_packages_text = self._format_app_packages()
+        self._invalidate_prompt_cache()
+    
+    def _format_app_packages(self) -> str:
+        """生成应用包名列表文本"""
+        return "\n".join(f"- {app}: {package}" for app, package in self.app_packages.items())
+    
+    def _invalidate_prompt_cache(self):
+        """清空系统提示词缓存，下次获取时重新生成"""
+        self._system_prompt_cache = None
+    
+    def get_ai_system_prompt(self) -> str:
+        """获取AI系统提示词（只依赖应用包名映射，生成一次后缓存）"""
+        if self._system_prompt_cache is None:
+            self._system_prompt_cache = self._build_ai_system_prompt()
+        return self._system_prompt_cache
+    
+    def _build_ai_system_prompt(self) -> str:
+        """生成AI系统提示词"""
+        return _SYSTEM_PROMPT_TEMPLATE.format_map({"app_packages_text": self._app_packages_text})
+    
+    def _shorten_observation(self, observation: str) -> str:
+        """截断历史步骤中的界面观察，控制执行历史随步数增长的token数"""
+        limit = self.history_observation_max_chars
+        if limit and len(observation) > limit:
+            return observation[:limit] + "…"
+        return observation
     
     def get_analysis_prompt(self, query: str, xml_content: str, current_step: int, history_steps: list = None) -> str:
         """获取分析用的用户提示词"""
         
-        # 构建历史步骤信息
+        # 构建历史步骤信息（逐行生成后一次拼接，避免随步数增长反复复制字符串）
         history_text = ""
-        if history_steps and len(history_steps) > 0:
-            history_text = "\n=== 执行历史 ===\n"
-            for i, step_info in enumerate(history_steps, 1):
-                step_desc = step_info.get('description', '未知操作')
-                step_type = step_info.get('type', '未知类型')
-                step_obs = step_info.get('observation', '')
-                history_text += f"步骤{i}: 手机界面状态为：{step_obs}；执行了: {step_desc} ;类型: {step_type})\n"
-            history_text += "\n根据以上执行历史，请分析当前界面状态并决定下一步操作。如果上一步执行完任务了，请判断了任务完成。\n"
+        if history_steps:
+            history_text = "".join([
+                _HISTORY_HEADER,
+                *(
+                    f"步骤{i}: 手机界面状态为：{self._shorten_observation(step_info.get('observation', ''))}；"
+                    f"执行了: {step_info.get('description', '未知操作')} ;类型: {step_info.get('type', '未知类型')})\n"
+                    for i, step_info in enumerate(history_steps, 1)
+                ),
+                _HISTORY_FOOTER
+            ])
         
-        return f"""
-当前任务: {query}
-当前步骤: {current_step}
-{history_text}
-XML界面结构信息:
-{xml_content}
-
-请以上信息并告诉我下一步应该如何操作。请只返回一个JSON格式的响应，不要包含其他文本。"""
+        # 按“不变 → 只追加 → 每步变化”排列：任务和执行历史在前，界面XML和当前步骤在后，
+        # 相邻步骤的提示词前缀保持一致，便于服务端上下文缓存复用
+        return "".join((
+            f"\n当前任务: {query}\n", history_text,
+            "\nXML界面结构信息:\n", xml_content,
+            f"\n\n当前步骤: {current_step}", _ANALYSIS_PROMPT_TAIL
+        ))
 
 # 创建全局配置实例
 config = Config() 
\ No newline at end of file
@@ -20,6 +20,7 @@ class DeviceController:
     def __init__(self):
         self.device = None
         self.screen_size = None
+        self._device_info = None  # 设备信息（会话期间不变，首次获取后缓存）
         self._connect()
     
     def _connect(self):
@@ -103,18 +104,9 @@ class DeviceController:
             else:
                 logger.warning("⚠️  无法获取屏幕信息")
             
-            # 测试截图功能
+            # 测试截图功能（截图只保留在内存中，不写入和删除测试文件）
             logger.info("📸 测试截图功能...")
-            test_screenshot_path = "test_connection.jpg"
-            self.device.screenshot(test_screenshot_path)
-            
-            # 测试完成后立即删除测试文件
-            try:
-                import os
-                if os.path.exists(test_screenshot_path):
-                    os.remove(test_screenshot_path)
-            except Exception as e:
-                logger.warning(f"⚠️ 清理测试截图文件失败: {e}")
+            self.device.screenshot()
             
             logger.info("✅ 截图功能正常")
             
@@ -130,11 +122,11 @@ class DeviceController:
         return save_path
     
     def get_xml_hierarchy(self, save_path: str) -> str:
-        """获取界面XML层次结构"""
-        xml_content = self.device.dump_hierarchy()
+        """获取界面XML层次结构并保存到文件，返回XML内容"""
+        xml_content = self.device.dump_hierarchy(compressed=config.xml_compressed)
         with open(save_path, "w", encoding="utf-8") as f:
             f.write(xml_content)
-        return save_path
+        return xml_content
     
     def click(self, x: int, y: int) -> bool:
         """点击指定坐标"""
@@ -204,14 +196,19 @@ class DeviceController:
         """获取当前应用信息"""
         try:
             return self.device.app_current()
-        except:
+        except Exception as e:
+            logger.warning(f"⚠️  获取当前应用失败: {e}")
             return {"package": "unknown", "activity": "unknown"}
     
     def get_device_info(self) -> dict:
-        """获取设备信息"""
+        """获取设备信息（首次获取后缓存，每个任务不再重复请求设备）"""
+        if self._device_info:
+            return self._device_info
+        
         try:
             device_info = self.device.device_info
             logger.info(f"📱 设备信息: {device_info}")
+            self._device_info = device_info
             return device_info
         except Exception as e:
             logger.warning(f"⚠️  获取设备信息失败: {e}")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON读写工具
+优先使用orjson加速序列化，未安装时回退到标准库json；安装zstandard时支持压缩写入
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖
+    zstandard = None
+
+
+def _dumps_indented(data) -> bytes:
+    """将数据序列化为2空格缩进的JSON（UTF-8字节，保留中文）"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def dump_json(data, file_path: str, compress: bool = False) -> str:
+    """将数据以2空格缩进写入JSON文件（UTF-8编码，保留中文），返回实际写入的文件路径
+    
+    compress为True且已安装zstandard时，写入zstd压缩文件（路径追加.zst后缀）
+    """
+    if compress and zstandard is not None:
+        file_path = f"{file_path}.zst"
+        with open(file_path, "wb") as raw:
+            with zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False) as writer:
+                writer.write(_dumps_indented(data))
+        return file_path
+    
+    with open(file_path, "wb") as f:
+        f.write(_dumps_indented(data))
+    return file_path
+
+
+def dumps_json_line(data) -> bytes:
+    """将数据序列化为单行JSON（UTF-8字节，以换行结尾），用于追加写入JSONL文件"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def open_json_lines(file_path: str):
+    """以二进制追加模式打开JSONL文件；若上次中断留下不完整的末行，先补换行，避免与新记录粘连"""
+    f = open(file_path, "ab+")
+    if f.tell() > 0:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+    return f
+
+
+def loads_json(text):
+    """解析JSON文本（str或bytes），解析失败时抛出ValueError"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def load_json_lines(file_path: str) -> list:
+    """读取JSONL文件，跳过无法解析的行（如中断时只写了一半的最后一行）"""
+    records = []
+    with open(file_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                records.append(loads_json(line))
+            except ValueError:
+                continue
+    return records
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+大模型响应缓存
+模型、参数和提示词完全相同时直接复用之前的响应，跳过网络请求
+最近使用的条目保存在内存中，同时持久化到SQLite，程序重启后仍可命中
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMCache:
+    """大模型响应缓存（内存LRU + SQLite持久化）"""
+    
+    def __init__(self, db_path: str = None, max_entries: int = 256, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl  # 默认有效期（秒），为空时永不过期
+        self._memory = OrderedDict()  # 缓存键 -> (过期时间, 响应文本)
+        self._lock = threading.Lock()
+        self._db = None
+        
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+                )
+                self._db.commit()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"⚠️  无法打开AI响应缓存文件，仅使用内存缓存: {e}")
+                self._db = None
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        """由模型名、参数、提示词等生成缓存键"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def get(self, key: str):
+        """读取缓存的响应，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+            
+            if self._db is None:
+                return None
+            
+            try:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                
+                value, expires_at = row
+                if expires_at is not None and expires_at <= now:
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  读取AI响应缓存失败: {e}")
+                return None
+            
+            self._remember(key, value, expires_at)
+            return value
+    
+    def set(self, key: str, value: str, ttl: float = None):
+        """写入响应，ttl为空时使用默认有效期"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._remember(key, value, expires_at)
+            
+            if self._db is None:
+                return
+            
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  写入AI响应缓存失败: {e}")
+    
+    def _remember(self, key: str, value: str, expires_at):
+        """放入内存缓存，超出容量时淘汰最久未使用的条目"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
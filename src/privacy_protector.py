@@ -6,11 +6,11 @@
 负责检测和处理敏感信息，如手机号码假名化
 """
 
+import glob
 import os
 import re
 import cv2
 import numpy as np
-import xml.etree.ElementTree as ET
 from typing import List, Tuple, Optional, Dict
 from .config import config
 from .logger_config import get_logger
@@ -18,6 +18,15 @@ from utils.phone_number_processor import PhoneNumberProcessor
 
 logger = get_logger(__name__)
 
+# bounds字符串，格式: [left,top][right,bottom]（部分超出屏幕的控件坐标可能为负数）
+_BOUNDS_RE = re.compile(r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]')
+
+# 手机号中的空格和常见分隔符
+_PHONE_SEPARATOR_RE = re.compile(r'[\s\-\(\)\+]')
+
+# 11位中国大陆手机号
+_PHONE_RE = re.compile(r'1[3-9]\d{9}')
+
 class PrivacyProtector:
     """隐私保护器"""
     
@@ -97,20 +106,18 @@ class PrivacyProtector:
     
     def _parse_bounds(self, bounds_str: str) -> Optional[List[List[int]]]:
         """解析bounds字符串"""
-        try:
-            # 格式: [left,top][right,bottom]
-            pattern = r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]'
-            match = re.match(pattern, bounds_str)
-            
-            if match:
-                left, top, right, bottom = map(int, match.groups())
-                return [[left, top], [right, bottom]]
-            
+        # AI返回的bounds不一定是字符串，非字符串无法解析
+        if not isinstance(bounds_str, str):
+            logger.error(f"❌ 边界解析失败: {bounds_str!r}")
             return None
-            
-        except Exception as e:
-            logger.error(f"❌ 边界解析失败: {e}")
+        
+        # 一次匹配取出四个坐标
+        match = _BOUNDS_RE.match(bounds_str)
+        if not match:
             return None
+        
+        left, top, right, bottom = map(int, match.groups())
+        return [[left, top], [right, bottom]]
     
     def _anonymize_phone_number(self, img_path: str, phone_info: Dict, output_path: str) -> bool:
         """对单个手机号进行假名化"""
@@ -146,7 +153,7 @@ class PrivacyProtector:
             return ""
         
         # 去除所有空格和常见分隔符
-        cleaned = re.sub(r'[\s\-\(\)\+]', '', phone_text)
+        cleaned = _PHONE_SEPARATOR_RE.sub('', phone_text)
         
         # 如果是+86开头，去掉国家代码
         if cleaned.startswith('+86'):
@@ -155,11 +162,11 @@ class PrivacyProtector:
             cleaned = cleaned[2:]
         
         # 确保是11位数字
-        if re.match(r'^1[3-9]\d{9}$', cleaned):
+        if _PHONE_RE.fullmatch(cleaned):
             return cleaned
         
         # 如果不符合标准格式，尝试提取11位数字
-        phone_match = re.search(r'1[3-9]\d{9}', phone_text)
+        phone_match = _PHONE_RE.search(phone_text)
         if phone_match:
             return phone_match.group()
         
@@ -169,7 +176,6 @@ class PrivacyProtector:
     def _cleanup_temp_files(self, base_name: str):
         """清理临时文件"""
         try:
-            import glob
             temp_pattern = f"{base_name}_temp_*.jpg"
             temp_files = glob.glob(temp_pattern)
             
@@ -7,21 +7,47 @@
 """
 
 import os
-import json
+import hashlib
 import time
 import uuid
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 from .config import config
 from .device_controller import DeviceController
 from .ai_analyzer import AIAnalyzer
 from .privacy_protector import PrivacyProtector
+from .json_utils import dump_json
 from utils.image_marker import ImageMarker
 from .logger_config import get_logger
 from datetime import datetime
 
 logger = get_logger(__name__)
 
+# 查询中的括号内容（中英文括号），创建任务时去除
+_BRACKET_RE = re.compile(r'[（(].*?[）)]')
+
+# bounds字符串，格式: [left,top][right,bottom]（部分超出屏幕的控件坐标可能为负数）
+_BOUNDS_RE = re.compile(r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]')
+
+# 页面加载中的常见文本（不区分大小写，一次扫描匹配所有关键词）
+_LOADING_TEXT_RE = re.compile(
+    '|'.join(map(re.escape, ['loading', '加载中', '正在加载', 'please wait', '请稍候'])),
+    re.IGNORECASE
+)
+
+
+def _has_fewer_nodes(xml_content: str, limit: int) -> bool:
+    """XML中的节点数是否少于limit（数到limit个即停止，不必扫描整个XML）"""
+    pos = 0
+    for _ in range(limit):
+        pos = xml_content.find('<node', pos)
+        if pos < 0:
+            return True
+        pos += len('<node')
+    return False
+
+
 class TaskExecutor:
     """任务执行器"""
     
@@ -35,6 +61,14 @@ class TaskExecutor:
         self.history_steps = []  # 添加历史步骤记录
         self.privacy_enabled = False  # 隐私保护开关
         self.is_interrupted = False  # 中断标志
+        self._last_xml_digest = None  # 上一步界面XML的摘要，用于判断操作后界面是否变化
+        self._last_loading_check = None  # 最近一次加载检测的 (XML摘要, 是否加载中)
+        self._capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")  # 后台截图线程
+    
+    def close(self):
+        """释放执行器持有的后台线程（截图线程及AI分析器的QwenVL线程）"""
+        self._capture_pool.shutdown(wait=True)
+        self.ai_analyzer.close()
     
     def interrupt_task(self):
         """中断当前任务"""
@@ -84,11 +118,11 @@ class TaskExecutor:
         """初始化任务数据"""
         # 重置历史步骤
         self.history_steps = []
+        self._last_xml_digest = None
         
-        pattern = r'[（(].*?[）)]'
-        if re.search(pattern, query):
+        if _BRACKET_RE.search(query):
             # 去除括号内容
-            clean_query = re.sub(pattern, '', query)
+            clean_query = _BRACKET_RE.sub('', query)
             logger.info(f"🔄 原始查询: {query}")
             logger.info(f"🔄 处理后查询: {clean_query}")
         else:
@@ -99,7 +133,8 @@ class TaskExecutor:
         self.task_data = {
             "phone": "Unknown Device",
             "os": "Unknown OS", 
-            "screen_resolution": config.default_screen_resolution,
+            # 使用本执行器所连设备的分辨率（多设备并发时全局配置可能已被其他设备覆盖）
+            "screen_resolution": list(self.device.screen_size or config.default_screen_resolution),
             "query": clean_query,
             "episode_id": episode_id,
             "data": []
@@ -145,7 +180,7 @@ class TaskExecutor:
             logger.info(f"\n=== 步骤 {step} ===")
             
             # 1. 截图和获取XML
-            screenshot_path, xml_path = self._wait_for_page_load(step)
+            screenshot_path, xml_path, xml_content = self._wait_for_page_load(step)
             
             # 检查中断请求
             if self.is_interrupted:
@@ -159,7 +194,8 @@ class TaskExecutor:
                     self.query, 
                     step,
                     screenshot_path=screenshot_path,
-                    history_steps = self.history_steps
+                    history_steps = self.history_steps,
+                    xml_content=xml_content
                 )
             except Exception as e:
                 logger.error(f"❌ AI分析失败: {str(e)}")
@@ -224,80 +260,87 @@ class TaskExecutor:
         return False
     
     def _capture_screen_state(self, step: int) -> tuple:
-        """捕获屏幕状态，返回截图路径和XML路径"""
-        
-        # 截图
+        """捕获屏幕状态，返回截图路径、XML路径和XML内容"""
         screenshot_name = f"1-{step}.jpg"
         screenshot_path = os.path.join(self.output_dir, screenshot_name)
-        self.device.screenshot(screenshot_path)
-        
-        # 获取XML
         xml_name = f"1-{step}.xml"
         xml_path = os.path.join(self.output_dir, xml_name)
-        self.device.get_xml_hierarchy(xml_path)
+        
+        # 截图和获取XML是两次独立的设备请求，截图在后台线程中同时进行
+        screenshot_future = self._capture_pool.submit(self.device.screenshot, screenshot_path)
+        try:
+            # 获取XML（同时保留内容，后续检测无需重新读取文件）
+            xml_content = self.device.get_xml_hierarchy(xml_path)
+        finally:
+            # 等待截图完成（截图失败时抛出异常）
+            screenshot_future.result()
         
         # logger.info(f"📱 已捕获屏幕状态: {screenshot_name}, {xml_name}")
-        return screenshot_path, xml_path
+        return screenshot_path, xml_path, xml_content
     
-    def _is_page_loading(self, xml_path: str) -> bool:
-        """检测页面是否正在加载中"""
-        try:
-            with open(xml_path, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
-            
-            # 检测加载状态的特征
-            loading_indicators = [
-                # WebView加载状态
-                'NAF="true"' in xml_content and 'android.webkit.WebView' in xml_content,
-                # 常见的加载文本
-                any(keyword in xml_content.lower() for keyword in [
-                    'loading', '加载中', '正在加载', 'please wait', '请稍候'
-                ]),
-                # 空白页面特征（主要内容区域为空）
-                xml_content.count('<node') < 50 and 'WebView' in xml_content
-            ]
-            
-            # 如果有任何一个指标为True，认为页面正在加载
-            is_loading = any(loading_indicators)
-            
-            if is_loading:
-                logger.info("🔄 检测到页面正在加载中...")
-                return True
-            
-            return False
-            
-        except Exception as e:
-            logger.warning(f"⚠️ 检测页面加载状态失败: {e}")
-            return False
+    def _is_page_loading(self, xml_content: str) -> bool:
+        """根据XML内容检测页面是否正在加载中"""
+        # 检测加载状态的特征，有任何一个成立即认为页面正在加载（命中后不再检查其余特征）
+        is_loading = (
+            # WebView加载状态
+            ('NAF="true"' in xml_content and 'android.webkit.WebView' in xml_content)
+            # 常见的加载文本（无需先生成整个XML的小写副本）
+            or _LOADING_TEXT_RE.search(xml_content) is not None
+            # 空白页面特征（主要内容区域为空）
+            or ('WebView' in xml_content and _has_fewer_nodes(xml_content, 50))
+        )
+        
+        if is_loading:
+            logger.info("🔄 检测到页面正在加载中...")
+            return True
+        
+        return False
+    
+    def _is_page_loading_cached(self, xml_digest: bytes, xml_content: str) -> bool:
+        """检测页面是否正在加载中，XML与上次检测相同时直接返回上次的结果"""
+        if self._last_loading_check is not None and self._last_loading_check[0] == xml_digest:
+            return self._last_loading_check[1]
+        
+        is_loading = self._is_page_loading(xml_content)
+        self._last_loading_check = (xml_digest, is_loading)
+        return is_loading
     
     def _wait_for_page_load(self, step: int, max_retries: int = 4) -> tuple:
-        """等待页面加载完成，返回最终的截图和XML路径"""
+        """等待页面加载完成，返回最终的截图路径、XML路径和XML内容"""
         for retry in range(max_retries):
-            screenshot_path, xml_path = self._capture_screen_state(step)
+            screenshot_path, xml_path, xml_content = self._capture_screen_state(step)
+            xml_digest = hashlib.blake2b(xml_content.encode("utf-8"), digest_size=16).digest()
             
-            if not self._is_page_loading(xml_path):
+            # 界面与上一步完全相同时，上一步操作可能尚未生效，先等待一次再重新捕获，避免对同一界面重复调用模型
+            unchanged = retry == 0 and xml_digest == self._last_xml_digest
+            
+            if not unchanged and not self._is_page_loading_cached(xml_digest, xml_content):
                 logger.info("✅ 页面加载完成")
-                return screenshot_path, xml_path
+                self._last_xml_digest = xml_digest
+                return screenshot_path, xml_path, xml_content
             
             if retry < max_retries - 1:  # 不是最后一次重试
-                logger.info(f"⏳ 页面加载中，等待2秒后重试... (第{retry + 1}/{max_retries}次)")
+                if unchanged:
+                    logger.info("⏳ 界面与上一步相同，等待2秒后重新捕获...")
+                else:
+                    logger.info(f"⏳ 页面加载中，等待2秒后重试... (第{retry + 1}/{max_retries}次)")
                 
-                # 删除加载中的临时文件，避免保存中间状态
-                try:
-                    if os.path.exists(screenshot_path):
-                        os.remove(screenshot_path)
-                        logger.debug(f"🗑️ 删除加载中的截图: {os.path.basename(screenshot_path)}")
-                    if os.path.exists(xml_path):
-                        os.remove(xml_path)
-                        logger.debug(f"🗑️ 删除加载中的XML: {os.path.basename(xml_path)}")
-                except Exception as e:
-                    logger.warning(f"⚠️ 删除临时文件失败: {e}")
+                # 删除加载中的临时文件，避免保存中间状态（文件刚写入，直接删除，不存在时忽略）
+                for temp_path, kind in ((screenshot_path, "截图"), (xml_path, "XML")):
+                    try:
+                        os.remove(temp_path)
+                        logger.debug(f"🗑️ 删除加载中的{kind}: {os.path.basename(temp_path)}")
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logger.warning(f"⚠️ 删除临时文件失败: {e}")
                 
                 time.sleep(2)
             else:
                 logger.warning("⚠️ 页面可能仍在加载，但已达到最大重试次数，保留当前文件")
         
-        return screenshot_path, xml_path
+        self._last_xml_digest = xml_digest
+        return screenshot_path, xml_path, xml_content
     
     def _display_analysis_result(self, ai_result: dict, step: int):
         """显示AI分析结果"""
@@ -525,9 +568,7 @@ class TaskExecutor:
     def _save_task_result(self):
         """保存任务结果"""
         task_file = os.path.join(self.output_dir, "task.json")
-        
-        with open(task_file, "w", encoding="utf-8") as f:
-            json.dump(self.task_data, f, indent=2, ensure_ascii=False)
+        dump_json(self.task_data, task_file)
         
         logger.info(f"📄 任务数据已保存: {task_file}")
     
@@ -535,9 +576,7 @@ class TaskExecutor:
         """保存中断的任务"""
         if self.task_data and self.output_dir:
             interrupted_file = os.path.join(self.output_dir, "task_interrupted.json")
-            
-            with open(interrupted_file, "w", encoding="utf-8") as f:
-                json.dump(self.task_data, f, indent=2, ensure_ascii=False)
+            dump_json(self.task_data, interrupted_file)
             
             logger.info(f"💾 中断任务已保存: {interrupted_file}")
     
@@ -619,20 +658,17 @@ class TaskExecutor:
     
     def _parse_bounds_string(self, bounds_str: str) -> Optional[List[List[int]]]:
         """解析bounds字符串"""
-        try:
-            import re
-            # 格式: [left,top][right,bottom]
-            pattern = r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]'
-            match = re.match(pattern, bounds_str)
-            
-            if match:
-                left, top, right, bottom = map(int, match.groups())
-                return [[left, top], [right, bottom]]
-            
+        # AI返回的bounds不一定是字符串，非字符串无法解析
+        if not isinstance(bounds_str, str):
+            logger.error(f"❌ 边界解析失败: {bounds_str!r}")
             return None
-            
-        except Exception as e:
-            logger.error(f"❌ 边界解析失败: {e}")
+        
+        # 一次匹配取出四个坐标
+        match = _BOUNDS_RE.match(bounds_str)
+        if not match:
             return None
+        
+        left, top, right, bottom = map(int, match.groups())
+        return [[left, top], [right, bottom]]
 
  
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""AI响应解析测试"""
+import pytest
+
+from src.ai_analyzer import AIAnalyzer
+
+
+@pytest.fixture
+def analyzer():
+    # 解析逻辑不依赖API配置，跳过__init__
+    return AIAnalyzer.__new__(AIAnalyzer)
+
+
+def test_parse_complete_response(analyzer):
+    response = '```json\n{"observation": "首页", "plan": {"description": "点击搜索", "type": "Tap", "position": [1, 2]}}\n```'
+    result = analyzer._parse_response(response)
+    assert result["observation"] == "首页"
+    assert result["plan"]["type"] == "Tap"
+
+
+def test_truncated_outer_object_is_rejected(analyzer):
+    # 外层对象被截断，但其中的plan本身是合法JSON，不能被当作分析结果返回
+    response = '{"observation": "首页", "plan": {"description": "点击搜索", "type": "Tap", "position": [1, 2]}, "is_task_completed": fal'
+    assert analyzer._extract_first_valid_json(response) is None
+    with pytest.raises(ValueError):
+        analyzer._parse_response(response)
@@ -0,0 +1,34 @@
+"""Excel表头读取测试"""
+import pandas as pd
+from openpyxl import Workbook
+
+from app.utils.validators import get_sheet_headers
+
+
+def _write_workbook(path, header):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(header)
+    sheet.append(list(range(len(header))))
+    workbook.save(path)
+
+
+def test_headers_match_pandas(tmp_path):
+    # 数字表头、空白表头和重复表头都应与pandas读取结果一致
+    path = tmp_path / "headers.xlsx"
+    _write_workbook(path, ["query", 2024, None, "query", "query.1", "query"])
+    
+    headers = get_sheet_headers(str(path))["Sheet1"]
+    
+    assert headers == ("query", "2024", "Unnamed: 2", "query.2", "query.1", "query.3")
+    expected = tuple(str(col) for col in pd.read_excel(path, sheet_name="Sheet1", nrows=0).columns)
+    assert headers == expected
+
+
+def test_trailing_blank_headers_are_dropped(tmp_path):
+    # 与pandas nrows=0 的读取结果一致：表头行末尾的空单元格不算列
+    path = tmp_path / "trailing.xlsx"
+    _write_workbook(path, ["query", None, None])
+    
+    assert get_sheet_headers(str(path))["Sheet1"] == ("query",)
@@ -8,6 +8,7 @@
 
 from PIL import Image, ImageDraw
 import math
+import shutil
 import sys
 import os
 
@@ -27,30 +28,38 @@ class ImageMarker:
                    start_position: list = None, stop_position: list = None) -> bool:
         """在截图上标记操作位置"""
         try:
-            img = Image.open(screenshot_path).convert("RGB")
-            draw = ImageDraw.Draw(img)
+            is_swipe = action_type.lower() == "swipe"
             
-            if action_type.lower() == "swipe":
+            # 先确定标记位置，无法标记时直接保存原图，不必解码和重新编码图像
+            if is_swipe:
                 # 优先使用新格式参数
                 s_start = start_position or swipe_start
                 s_end = stop_position or swipe_end
                 
-                if s_start and s_end:
-                    # 标记滑动操作
-                    ImageMarker._draw_swipe_marker(draw, s_start, s_end, box)
-                    logger.info(f"✅ 标记滑动路径: ({s_start[0]}, {s_start[1]}) -> ({s_end[0]}, {s_end[1]})")
-                else:
+                if not (s_start and s_end):
                     logger.warning("⚠️  滑动操作缺少起始或结束位置，保存原图")
+                    return ImageMarker._save_original(screenshot_path, output_path)
             else:
-                # 标记点击操作
                 center_x, center_y = ImageMarker._get_center_position(position, box)
                 
-                if center_x is not None and center_y is not None:
-                    # 绘制控件整体框和标记点
-                    ImageMarker._draw_marker(draw, center_x, center_y, box)
-                    logger.info(f"✅ 标记点击位置: ({center_x}, {center_y})")
-                else:
+                if center_x is None or center_y is None:
                     logger.warning("⚠️  无法确定点击位置，保存原图")
+                    return ImageMarker._save_original(screenshot_path, output_path)
+            
+            img = Image.open(screenshot_path)
+            # JPEG截图本身就是RGB，无需再转换出一份图像副本
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            draw = ImageDraw.Draw(img)
+            
+            if is_swipe:
+                # 标记滑动操作
+                ImageMarker._draw_swipe_marker(draw, s_start, s_end, box)
+                logger.info(f"✅ 标记滑动路径: ({s_start[0]}, {s_start[1]}) -> ({s_end[0]}, {s_end[1]})")
+            else:
+                # 标记点击操作：绘制控件整体框和标记点
+                ImageMarker._draw_marker(draw, center_x, center_y, box)
+                logger.info(f"✅ 标记点击位置: ({center_x}, {center_y})")
             
             img.save(output_path)
             return True
@@ -59,6 +68,15 @@ class ImageMarker:
             logger.error(f"❌ 图像标记失败: {e}")
             return False
     
+    @staticmethod
+    def _save_original(screenshot_path: str, output_path: str) -> bool:
+        """保存未标记的原图（格式相同时直接复制文件，不重新编码）"""
+        if os.path.splitext(screenshot_path)[1].lower() == os.path.splitext(output_path)[1].lower():
+            shutil.copyfile(screenshot_path, output_path)
+        else:
+            Image.open(screenshot_path).convert("RGB").save(output_path)
+        return True
+    
     @staticmethod
     def _get_center_position(position: list, box: list) -> tuple:
         """获取点击中心位置"""
@@ -144,7 +162,7 @@ class ImageMarker:
         # 计算箭头方向
         dx = tx - fx
         dy = ty - fy
-        length = math.sqrt(dx*dx + dy*dy)
+        length = math.hypot(dx, dy)
         
         if length > 0:
             # 单位向量
@@ -11,6 +11,9 @@ import os
 from typing import List, Tuple, Optional
 import re
 
+# 手机号中的空格和常见分隔符
+_PHONE_SEPARATOR_RE = re.compile(r'[\s\-\(\)\+]')
+
 class PhoneNumberProcessor:
     """
     电话号码处理器类
@@ -173,7 +176,7 @@ class PhoneNumberProcessor:
             return img
         
         # 清理手机号，去除空格等字符
-        clean_phone = re.sub(r'[\s\-\(\)\+]', '', target_phone_number)
+        clean_phone = _PHONE_SEPARATOR_RE.sub('', target_phone_number)
         if len(clean_phone) < len(bboxes):
             # 如果清理后的手机号长度不够，使用原始字符串
             clean_phone = target_phone_number